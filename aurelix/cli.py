@@ -5,6 +5,9 @@ import os
 import asyncio
 from .api import load_app
 from . import schema
+from . import exc
+from . import state
+from .crud.importer import import_file, ImportProgress, IMPORT_BATCH_SIZE
 from .settings import Settings
 from alembic import command as alembic_command
 from alembic import config as alembic_config
@@ -68,6 +71,16 @@ def main(argv=None):
     init_command = subparsers.add_parser('init')
     init_command.add_argument('DIRECTORY')
 
+    import_command = subparsers.add_parser('import', help='Load rows from a CSV, NDJSON, Arrow or Parquet file into a model')
+    import_command.add_argument('MODEL')
+    import_command.add_argument('FILE')
+    import_command.add_argument('-f', '--format', choices=[f.value for f in schema.ExportFormat], default=None,
+                                help='File format, detected from the file extension by default')
+    import_command.add_argument('-b', '--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    import_command.add_argument('--validate', action='store_true', help='Apply model and field validators')
+    import_command.add_argument('--transform', action='store_true', help='Apply field input transformers')
+    import_command.add_argument('--keep-ids', action='store_true', help='Import the id column instead of assigning new ids')
+
     db_command = subparsers.add_parser('db')
     db_subcommand = db_command.add_subparsers(dest='db_command')
     db_subcommand.add_parser('init')
@@ -86,4 +99,35 @@ def main(argv=None):
         app = asyncio.run(load_app(settings.CONFIG))
         uvicorn.run(app, host=args.host, port=args.port)
     elif args.command == 'init':
-        init_app(path=args.DIRECTORY)
\ No newline at end of file
+        init_app(path=args.DIRECTORY)
+    elif args.command == 'import':
+        settings = Settings()
+        if not settings.CONFIG:
+            print('AURELIX_CONFIG environment is not set', file=sys.stderr)
+            sys.exit(1)
+        try:
+            result = asyncio.run(import_data(settings.CONFIG, args))
+        except exc.AurelixException as e:
+            print('Import failed: %s' % e.message, file=sys.stderr)
+            sys.exit(1)
+        print('Imported %s rows into %s in %.1fs (%.0f rows/s)' % (
+            result.rows, args.MODEL, result.seconds, result.rate))
+
+def print_progress(progress: ImportProgress):
+    print('%s rows (%.0f rows/s)' % (progress.rows, progress.rate), file=sys.stderr)
+
+async def import_data(config: str, args: argparse.Namespace) -> ImportProgress:
+    app = await load_app(config)
+    format = schema.ExportFormat(args.format) if args.format else None
+    # running workers are told about the imported rows through the
+    # invalidation bus of the app
+    bus = state.APP_STATE[app].get('invalidation_bus', None)
+    if bus is not None:
+        await bus.start(lambda message: None)
+    try:
+        return await import_file(app, args.MODEL, args.FILE, format=format, batch_size=args.batch_size,
+                                 validate=args.validate, transform=args.transform, keep_ids=args.keep_ids,
+                                 progress=print_progress)
+    finally:
+        if bus is not None:
+            await bus.stop()
\ No newline at end of file
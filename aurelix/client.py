@@ -1,4 +1,7 @@
 import requests
+import json
+import collections
+import copy
 from . import schema
 from time import time
 import typing
@@ -13,7 +16,8 @@ class ClientException(Exception):
 
 class APIClient(object):
 
-    def __init__(self, base_url: str, client_id: str | None = None, client_secret: str | None = None, **kwargs):
+    def __init__(self, base_url: str, client_id: str | None = None, client_secret: str | None = None, 
+                 etag_cache_size: int = 1000, **kwargs):
         if base_url.endswith('/'):
             self.base_url = base_url[:-1]
         else:
@@ -24,6 +28,10 @@ class APIClient(object):
         self._token_expiry = None
         self._scope = None
         self.requests_extra = kwargs
+        # responses of GET requests by url, parameters and credentials, 
+        # revalidated through If-None-Match
+        self.etag_cache_size = etag_cache_size
+        self._etag_cache: collections.OrderedDict[tuple, tuple[str, typing.Any]] = collections.OrderedDict()
         self.config: schema.WellKnownConfiguration = self.get_config()
 
 
@@ -94,7 +102,18 @@ class APIClient(object):
         if self.token:
             param.setdefault('headers', {})
             param['headers']['Authorization'] = self.token.token_type + ' ' + self.token.access_token
+        cache_key = None
+        if method.lower() == 'get' and not args and self.etag_cache_size:
+            cache_key = (url, json.dumps(param.get('params', None), sort_keys=True, default=str),
+                         param.get('headers', {}).get('Authorization', None))
+            cached = self._etag_cache.get(cache_key, None)
+            if cached is not None:
+                param['headers'] = dict(param.get('headers', None) or {})
+                param['headers']['If-None-Match'] = cached[0]
         resp: requests.Response = getattr(requests, method.lower())(url, *args, **param)
+        if resp.status_code == 304 and cache_key in self._etag_cache:
+            self._etag_cache.move_to_end(cache_key)
+            return copy.deepcopy(self._etag_cache[cache_key][1])
         if resp.status_code != 200:
             try:
                 data = resp.json()
@@ -107,10 +126,18 @@ class APIClient(object):
             content_type = resp.headers.get('content-type', '').lower()
             if content_type == 'application/json':
                 data = resp.json()
+                if cache_key is not None and resp.headers.get('etag', None):
+                    self._cache_response(cache_key, resp.headers['etag'], data)
                 return data
             return resp.text
         return None
     
+    def _cache_response(self, key: tuple, etag: str, data):
+        self._etag_cache[key] = (etag, copy.deepcopy(data))
+        self._etag_cache.move_to_end(key)
+        while len(self._etag_cache) > self.etag_cache_size:
+            self._etag_cache.popitem(last=False)
+
     def stream_request(self, method, path, *args, **kwargs):
         url = self.url(path)
         kwargs['stream'] = True
@@ -288,12 +315,13 @@ class SearchResult(object):
         self.result = result
 
     def __iter__(self) -> typing.Iterator[Model]:
-        for d in self.result['data']:
-            yield Model(self.api, self.collection, d)
-        next = self.next()
-        if next:
-            for o in next:
-                yield o
+        # next links carry a keyset cursor, so walking the whole 
+        # collection does not re-scan skipped rows on every page
+        result = self
+        while result:
+            for d in result.result['data']:
+                yield Model(self.api, self.collection, d)
+            result = result.next()
 
     def __getitem__(self, key) -> Model:
         for idx, m in self:
@@ -351,16 +379,41 @@ class Collection(object):
     def __iter__(self) -> typing.Iterator[Model]:
         return self.search(page_size=100).__iter__()
     
-    def get_item(self, name: str | int) -> Model:
+    def get_item(self, name: str | int, fields: list[str] = None) -> Model:
         name = str(name)
-        data = self.get(name)
+        params = {}
+        if fields:
+            params['fields'] = ','.join(fields)
+        data = self.get(name, params=params)
         return Model(self.api, self, data['data'])
     
+    def get_items(self, ids: list[str | int], fields: list[str] = None) -> list[Model]:
+        # fetched with one request, identifiers which do not exist are left out
+        payload = {'ids': ids}
+        if fields:
+            payload['fields'] = fields
+        result = self.post('/+batch-get', json=payload)
+        return [Model(self.api, self, d) for d in result['data']]
+    
     def create(self, data: dict) -> Model:
         result = self.post(json=data)
         return Model(self.api, self, result['data'])
     
-    def search(self, query:str=None, page: int =0, page_size: int=10, order_by: list[tuple[str, str]] = None):
+    def bulk_create(self, items: list[dict]) -> list[Model]:
+        # all items are created in one transaction, or none when any of them fails
+        result = self.post('/+bulk', json=items)
+        return [Model(self.api, self, d) for d in result['data']]
+
+    def bulk_update(self, items: dict[str | int, dict]) -> list[Model]:
+        payload = [{'identifier': k, 'data': v} for k, v in items.items()]
+        result = self.patch('/+bulk', json=payload)
+        return [Model(self.api, self, d) for d in result['data']]
+
+    def bulk_delete(self, identifiers: list[str | int]):
+        return self.delete('/+bulk', json={'delete': True, 'identifiers': identifiers})
+    
+    def search(self, query:str=None, page: int =0, page_size: int=10, order_by: list[tuple[str, str]] = None,
+               cursor: str = None, fields: list[str] = None):
         order_by = order_by or []
         payload = {
             'page': page,
@@ -368,10 +421,53 @@ class Collection(object):
         }
         if query:
             payload['query'] = query
+        if cursor:
+            payload['cursor'] = cursor
         if order_by:
             payload['order_by'] = ','.join([':'.join(o) for o in order_by])
+        if fields:
+            payload['fields'] = ','.join(fields)
         result = self.get(params=payload)
         return SearchResult(self.api, self, result)
+
+    def _export_params(self, format: str, query: str = None, order_by: list[tuple[str, str]] = None, 
+                       fields: list[str] = None) -> dict:
+        params = {'format': format}
+        if query:
+            params['query'] = query
+        if order_by:
+            params['order_by'] = ','.join([':'.join(o) for o in order_by])
+        if fields:
+            params['fields'] = ','.join(fields)
+        return params
+
+    def export(self, query: str = None, order_by: list[tuple[str, str]] = None, 
+               fields: list[str] = None) -> typing.Iterator[dict]:
+        # streams the attributes of every item, without paging
+        params = self._export_params('ndjson', query, order_by, fields)
+        buf = b''
+        for chunk in self.api.stream_request('get', self.url('/+export'), params=params):
+            buf += chunk
+            lines = buf.split(b'\n')
+            buf = lines.pop()
+            for line in lines:
+                if line:
+                    yield json.loads(line)
+        if buf.strip():
+            yield json.loads(buf)
+
+    def to_arrow(self, query: str = None, order_by: list[tuple[str, str]] = None, 
+                 fields: list[str] = None) -> 'pyarrow.Table':
+        # requires pyarrow, json fields are returned as json encoded strings
+        import pyarrow
+        params = self._export_params('arrow', query, order_by, fields)
+        data = b''.join(self.api.stream_request('get', self.url('/+export'), params=params))
+        return pyarrow.ipc.open_stream(data).read_all()
+
+    def to_frame(self, query: str = None, order_by: list[tuple[str, str]] = None, 
+                 fields: list[str] = None) -> 'pandas.DataFrame':
+        # requires pyarrow and pandas
+        return self.to_arrow(query, order_by, fields).to_pandas()
     
     def __repr__(self) -> str:
         return "<Collection at '/%s'>" % self.config.name
@@ -0,0 +1,100 @@
+import io
+import json
+import typing
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .. import schema
+
+# Arrow IPC and Parquet encoding of listing and export responses. pyarrow
+# is an optional dependency, this module is only imported when one of these
+# formats is requested
+
+ARROW_TYPES = {
+    'string': pa.string(),
+    'text': pa.string(),
+    'integer': pa.int32(),
+    'biginteger': pa.int64(),
+    'boolean': pa.bool_(),
+    'float': pa.float64(),
+    'datetime': pa.timestamp('us'),
+    'date': pa.date32(),
+    'encrypted-string': pa.string(),
+    'json': pa.string(),
+}
+
+CORE_ARROW_TYPES = {
+    'id': pa.int64(),
+    'dateCreated': pa.timestamp('us'),
+    'dateModified': pa.timestamp('us'),
+    'creator': pa.string(),
+    'editor': pa.string(),
+}
+
+# json fields are sent as json encoded strings, marked in the field metadata
+JSON_METADATA = {b'aurelix.type': b'json'}
+
+def arrow_schema(spec: schema.ModelSpec, columns: list[str]) -> pa.Schema:
+    fields = []
+    for c in columns:
+        if c in CORE_ARROW_TYPES:
+            fields.append(pa.field(c, CORE_ARROW_TYPES[c]))
+            continue
+        data_type = spec.fields[c].dataType.type
+        fields.append(pa.field(c, ARROW_TYPES[data_type],
+                               metadata=JSON_METADATA if data_type == 'json' else None))
+    return pa.schema(fields)
+
+def record_batch(rows: list[dict], arrow_schema: pa.Schema) -> pa.RecordBatch:
+    columns = []
+    for field in arrow_schema:
+        values = [r.get(field.name, None) for r in rows]
+        if field.metadata == JSON_METADATA:
+            values = [None if v is None else json.dumps(v, default=str) for v in values]
+        columns.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(columns, schema=arrow_schema)
+
+class StreamSink(io.RawIOBase):
+    """Write-only file that hands out what has been written so far,
+    writers still see a continuous position for their offsets"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+async def arrow_stream(batches: typing.AsyncIterator[list[dict]],
+                       arrow_schema: pa.Schema) -> typing.AsyncIterator[bytes]:
+    sink = StreamSink()
+    writer = pa.ipc.new_stream(sink, arrow_schema)
+    async for rows in batches:
+        writer.write_batch(record_batch(rows, arrow_schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+async def parquet_stream(batches: typing.AsyncIterator[list[dict]],
+                         arrow_schema: pa.Schema) -> typing.AsyncIterator[bytes]:
+    # one row group per batch, the footer is written when the stream ends
+    sink = StreamSink()
+    writer = pq.ParquetWriter(sink, arrow_schema)
+    async for rows in batches:
+        writer.write_table(pa.Table.from_batches([record_batch(rows, arrow_schema)]))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -6,7 +6,7 @@ import pydantic
 import datetime
 import traceback
 from ..utils import validate_types
-from ..dependencies import get_permission_identities
+from ..dependencies import get_permission_identities, get_permission_parameters
 import dectate
 from transitions import Machine
 import typing
@@ -15,10 +15,29 @@ from .. import exc
 import os
 
 from .base import BaseCollection
+from .query import compile_query
+from .sqla import (permission_columns, permission_clauses, row_permitted, row_total, 
+                   search_statement, count_statement, estimate_statement, estimate_result,
+                   bulk_batches, bulk_select_statements, bulk_ordered,
+                   PERMITTED_COLUMN, TOTAL_COLUMN, BULK_PARAMETER_LIMIT)
 from ..exc import SearchException
 
+def record_data(record) -> dict:
+    # records from `databases` only apply the column result processors 
+    # (json, encrypted-string) on item access, asyncpg records expose the 
+    # raw values through _mapping
+    data = {k: record[k] for k in record._mapping.keys()}
+    data.pop(PERMITTED_COLUMN, None)
+    data.pop(TOTAL_COLUMN, None)
+    return data
+
 class AsyncSQLACollection(BaseCollection):
 
+    permissionFilterClauses: dict[str, sa.sql.expression.TextClause] = {}
+    supportsReturning: bool = False
+    supportsWindowFunctions: bool = False
+    supportsCountEstimate: bool = False
+
     @validate_types
     def __init__(self, request: fastapi.Request, 
                  database: databases.Database, 
@@ -28,92 +47,227 @@ class AsyncSQLACollection(BaseCollection):
         self.table = table
         self.db = database
 
+    async def get_permission_clauses(self) -> list:
+        cache = await self._permission_cache()
+        if 'clauses' not in cache:
+            filters = await self.get_permission_filters()
+            params = await get_permission_parameters(self.request)
+            cache['clauses'] = permission_clauses(self.permissionFilterClauses, filters, params)
+        return cache['clauses']
+
     @validate_types
     async def create(self, item: pydantic.BaseModel, secure=True, modify_object_store_fields=False, modify_workflow_status=False) -> pydantic.BaseModel:
         data = await self.transform_create_data(item, secure=secure, modify_object_store_fields=modify_object_store_fields,
                                                 modify_workflow_status=modify_workflow_status)
         await self.before_create(data)
-        async with self.db.transaction() as txn:
-            query = self.table.insert().values(**data)
-            new_id = await self.db.execute(query)
-            item = await self.get_by_id(new_id, secure=secure)
-            if item is None:
-                raise exc.Forbidden("You are not allowed to create this object")
+        if self.supportsReturning:
+            filters = []
+            if secure:
+                filters = list(await self.get_permission_clauses())
+            async with self.db.transaction() as txn:
+                query = self.table.insert().values(**data).returning(*permission_columns(self.table, filters))
+                row = await self.db.fetch_one(query)
+                if not row_permitted(row):
+                    raise exc.Forbidden("You are not allowed to create this object")
+            item = self.model_construct(record_data(row))
+        else:
+            async with self.db.transaction() as txn:
+                query = self.table.insert().values(**data)
+                new_id = await self.db.execute(query)
+                # read in the transaction, not through the row cache
+                row, permitted = await self._fetch_row('id', new_id, secure)
+                if not permitted:
+                    raise exc.Forbidden("You are not allowed to create this object")
+            item = self.model_construct(row)
+        self.invalidate_rows('id', [item.id])
         await self.after_create(item)
         return item
 
-    async def _get_by_field(self, field, value, secure: bool = True):
+    async def _fetch_row(self, field, value, secure: bool = True, fields: list[str] | None = None):
         filters = []
         if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
+            filters = list(await self.get_permission_clauses())
 
-        filters.append(getattr(self.table.c, field)==value)
-        query = self.table.select().where(sa.and_(*filters))
+        columns = permission_columns(self.table, filters, self.projection(fields))
+        query = sa.select(columns).where(getattr(self.table.c, field)==value)
         item = await self.db.fetch_one(query)
         if item == None:
-            if secure:
-                insecure_item = await self._get_by_field(field, value, secure=False)
-                if insecure_item:
-                    raise exc.Forbidden("You are not allowed to access this object")
-            return None
-        item = self.Schema.model_validate(item._asdict())
-        return item       
+            return None, False
+        return record_data(item), row_permitted(item)
     
-    @validate_types
-    async def search(self, query: str | None, offset: int = 0, limit: int | None = None, 
-               order_by: list[tuple[str,str]] | None = None, secure: bool =True):
-        
-        db_query = self.table.select()
+    async def _search_filters(self, query: str | None, secure: bool = True) -> list:
         filters = []
         if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
+            filters = list(await self.get_permission_clauses())
         if query: 
-            filters.append(sa.text(query))
-        if filters:
-            db_query = db_query.where(sa.and_(*filters))
-        db_query = db_query.limit(limit).offset(offset)
-        if order_by:
-            orderby = []
-            for c,d in order_by:
-                column = c
-                if getattr(self.table.c, c, None) is None:
-                    raise exc.ValidationError("Invalid sort field '%s'" % c)
-                if d.lower() == 'desc':
-                    column += ' desc'
-                elif d.lower() == 'asc':
-                    column += ' asc'
-                else:
-                    raise exc.ValidationError("Invalid sort direction '%s'" % d)
-                orderby.append(sa.text(column))
-            db_query = db_query.order_by(*orderby)
+            restricted_fields = []
+            if secure:
+                field_permissions = await self.get_field_permissions()
+                restricted_fields = field_permissions[schema.FieldPermission.restricted]
+            filters.append(compile_query(query, self.table, self.Schema, restricted_fields))
+        return filters
+
+    async def _fetch_rows(self) -> list[dict]:
+        query = sa.select(self.table).order_by(self.table.c.id)
+        return [record_data(r) for r in await self.db.fetch_all(query)]
+
+    async def _fetch_many_by_field(self, field, values: list, secure: bool = True, fields: list[str] | None = None):
+        if not values:
+            return []
+        filters = []
+        if secure:
+            filters = list(await self.get_permission_clauses())
+        columns = permission_columns(self.table, filters, self.projection(fields))
+        query = sa.select(columns).where(getattr(self.table.c, field).in_(values))
+        items = await self.db.fetch_all(query)
+        for item in items:
+            if not row_permitted(item):
+                raise exc.Forbidden("You are not allowed to access this object")
+        return [self.model_construct(record_data(i)) for i in items]
+
+    async def _fetch_many_data(self, filters: list, field: str, values: list, lock: bool = False) -> list[dict]:
+        items = []
+        for query in bulk_select_statements(self.table, filters, field, values, lock=lock):
+            # keeps the permission column, see record_data()
+            items += [{k: r[k] for k in r._mapping.keys()} for r in await self.db.fetch_all(query)]
+        return items
+
+    async def _insert_many(self, rows: list[dict], secure: bool = True):
+        filters = []
+        if secure:
+            filters = list(await self.get_permission_clauses())
+        async with self.db.transaction() as txn:
+            if self.supportsReturning:
+                records = []
+                for batch in bulk_batches(rows):
+                    query = self.table.insert().values(batch).returning(*permission_columns(self.table, filters))
+                    records += await self.db.fetch_all(query)
+                if not all(row_permitted(r) for r in records):
+                    raise exc.Forbidden("You are not allowed to create this object")
+                items = [record_data(r) for r in records]
+            else:
+                ids = [await self.db.execute(self.table.insert().values(**data)) for data in rows]
+                items = bulk_ordered(await self._fetch_many_data(filters, 'id', ids), 'id', ids,
+                                     "You are not allowed to create this object")
+        self.invalidate_rows('id', [i['id'] for i in items])
+        return [self.model_construct(i) for i in items]
+
+    async def _update_many(self, field, updates: list[tuple[typing.Any, dict]], secure: bool = True):
+        # permission filters are checked on the locked rows before the update
+        message = "You are not allowed to update this object"
+        filters = []
+        if secure:
+            filters = list(await self.get_permission_clauses())
+        values = [v for v, d in updates]
+        new_values = [d.get(field, v) for v, d in updates]
+        key = getattr(self.table.c, field)
+        async with self.db.transaction() as txn:
+            bulk_ordered(await self._fetch_many_data(filters, field, values, lock=True), field, values, message)
+            for value, data in updates:
+                await self.db.execute(self.table.update().where(key == value).values(**data))
+            items = bulk_ordered(await self._fetch_many_data(filters, field, new_values), field, new_values, message)
+        self.invalidate_rows(field, values)
+        return [self.model_construct(i) for i in items]
+
+    async def _delete_many(self, field, values: list, secure: bool = True):
+        filters = []
+        if secure:
+            filters = list(await self.get_permission_clauses())
+        column = getattr(self.table.c, field)
+        async with self.db.transaction() as txn:
+            for i in range(0, len(values), BULK_PARAMETER_LIMIT):
+                clauses = filters + [column.in_(values[i:i + BULK_PARAMETER_LIMIT])]
+                await self.db.execute(self.table.delete().where(sa.and_(*clauses)))
+        self.invalidate_rows(field, values)
+
+    @validate_types
+    async def search(self, query: str | None, offset: int = 0, limit: int | None = None, 
+               order_by: list[tuple[str,str]] | None = None, secure: bool =True, cursor: str | None = None,
+               fields: list[str] | None = None):
+        result = await self.search_reference(query, offset=offset, limit=limit, order_by=order_by, secure=secure, 
+                                             cursor=cursor, fields=fields)
+        if result is not None:
+            return result[0]
+        filters = await self._search_filters(query, secure)
+        cursor_values = self.cursor_values(cursor, order_by) if cursor else None
+        db_query = search_statement(self.table, filters, offset=offset, limit=limit, order_by=order_by, 
+                                    cursor_values=cursor_values, fields=self.projection(fields, order_by),
+                                    nulls_high=self.nullsSortHigh)
         try:
             items = await self.db.fetch_all(db_query)
         except Exception as e:
             raise SearchException(str(e))
         
-        items = [self.Schema.model_validate(i._asdict()) for i in items] 
+        items = [self.model_construct(record_data(i)) for i in items] 
         return items
+
+    @validate_types
+    async def search_with_total(self, query: str | None, offset: int = 0, limit: int | None = None, 
+               order_by: list[tuple[str,str]] | None = None, secure: bool =True, cursor: str | None = None,
+               fields: list[str] | None = None):
+        result = await self.search_reference(query, offset=offset, limit=limit, order_by=order_by, secure=secure, 
+                                             cursor=cursor, fields=fields)
+        if result is not None:
+            return result
+        # the window total would only count rows after the cursor
+        if cursor or not self.supportsWindowFunctions:
+            return await super().search_with_total(query, offset=offset, limit=limit, order_by=order_by, 
+                                                   secure=secure, cursor=cursor, fields=fields)
+        filters = await self._search_filters(query, secure)
+        db_query = search_statement(self.table, filters, offset=offset, limit=limit, order_by=order_by, with_total=True,
+                                    fields=self.projection(fields, order_by))
+        try:
+            items = await self.db.fetch_all(db_query)
+        except Exception as e:
+            raise SearchException(str(e))
+        if items:
+            total = row_total(items[0])
+        elif offset:
+            # page is past the end of the result set, no row to carry the total
+            total = await self.count(query, secure=secure)
+        else:
+            total = 0
+        items = [self.model_construct(record_data(i)) for i in items] 
+        return items, total
     
+    async def iterate(self, query: str | None, order_by: list[tuple[str,str]] | None = None, secure: bool = True,
+                      fields: list[str] | None = None, batch_size: int = 1000):
+        filters = await self._search_filters(query, secure)
+        db_query = search_statement(self.table, filters, order_by=order_by, fields=self.projection(fields, order_by))
+        batch = []
+        async for row in self.db.iterate(db_query):
+            batch.append(self.model_construct(record_data(row)))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
     @validate_types
     async def count(self, query: str | None, secure=True) -> int:
-        db_query = sa.select([sa.func.count()]).select_from(self.table)
-        filters  = []
-        if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
-
-        if query: 
-            filters.append(sa.text(query))
-        if filters:
-            db_query = db_query.where(sa.and_(*filters))
+        result = await self.search_reference(query, limit=0, secure=secure)
+        if result is not None:
+            return result[1]
+        filters = await self._search_filters(query, secure)
+        db_query = count_statement(self.table, filters)
         try:
             result = await self.db.fetch_one(db_query)
         except Exception as e:
             raise SearchException(str(e))
         return result[0]
 
+    @validate_types
+    async def estimate_count(self, query: str | None, secure=True) -> int:
+        if not self.supportsCountEstimate or self.referenceTable is not None:
+            return await self.count(query, secure=secure)
+        filters = await self._search_filters(query, secure)
+        db_query = estimate_statement(self.table, filters)
+        try:
+            result = await self.db.fetch_one(db_query)
+        except Exception as e:
+            raise SearchException(str(e))
+        return estimate_result(result)
+
     async def _update_by_field(self, field, value, item: dict, secure: bool=True, modify_object_store_fields: bool = False, 
                                modify_workflow_status: bool = False):
         data = await self.transform_update_data(item, secure=secure,
@@ -122,15 +276,26 @@ class AsyncSQLACollection(BaseCollection):
         await self.before_update(data)
         filters = []
         if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
-        filters.append(getattr(self.table.c, field)==value)
-        async with self.db.transaction() as txn:
-            query = self.table.update().where(sa.and_(*filters)).values(**data)
-            await self.db.execute(query)
-            item = await self._get_by_field(field, value, secure)
-            if item is None:
-                raise exc.Forbidden("You are not allowed to update this object")
+            filters = list(await self.get_permission_clauses())
+        key = getattr(self.table.c, field)==value
+        if self.supportsReturning:
+            async with self.db.transaction() as txn:
+                query = (self.table.update().where(sa.and_(*(filters + [key]))).values(**data)
+                            .returning(*permission_columns(self.table, filters)))
+                row = await self.db.fetch_one(query)
+                if not row_permitted(row):
+                    raise exc.Forbidden("You are not allowed to update this object")
+            item = self.model_construct(record_data(row))
+        else:
+            filters.append(key)
+            async with self.db.transaction() as txn:
+                query = self.table.update().where(sa.and_(*filters)).values(**data)
+                await self.db.execute(query)
+                row, permitted = await self._fetch_row(field, data.get(field, value), secure)
+                if not permitted:
+                    raise exc.Forbidden("You are not allowed to update this object")
+            item = self.model_construct(row)
+        self.invalidate_rows(field, [value])
         await self.after_update(item)
         return item
     
@@ -142,11 +307,11 @@ class AsyncSQLACollection(BaseCollection):
         await self.before_delete(item)
         filters = []
         if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
+            filters = list(await self.get_permission_clauses())
         filters.append(getattr(self.table.c, field)==value)
         query = self.table.delete().where(sa.and_(*filters))
         await self.db.execute(query)
+        self.invalidate_rows(field, [value])
         await self.after_delete(data)
         return True       
     
@@ -1,16 +1,28 @@
 from transitions.extensions.asyncio import AsyncMachine
 import os
 import dectate
-from ..utils import validate_types
+from ..utils import validate_types, decode_cursor
 import pydantic
 import fastapi
 import datetime
 from .. import exc
 from .. import schema
-from ..dependencies import get_permission_identities, get_token
+from ..dependencies import get_permission_identities, get_permission_parameters, get_token
+from .cache import RowCache, ResponseCache, CACHED_FIELDS
+from .reference import ReferenceTable, sort_rows
+from .query import match_query, field_adapter
+from .invalidation import InvalidationBus
 import typing
 import uuid
 
+async def call_batch(func: typing.Callable, collection, *args: list) -> list:
+    # batch call of a validator or transformer, functions loaded with a batch 
+    # signature carry their batch form as `batch`, others are called per item
+    batch = getattr(func, 'batch', None)
+    if batch is not None:
+        return await batch(collection, *args)
+    return [await func(collection, *a) for a in zip(*args)]
+
 class ModelValidators(pydantic.BaseModel):
     model: typing.Callable | None
     fields: dict[str, typing.Callable]
@@ -91,6 +103,15 @@ class BaseCollection(ExtensibleViewsApp):
     validators: ModelValidators
     fieldTransformers: ModelFieldTransformers
     objectStore: dict[str, FieldObjectStore]
+    fieldDecoders: dict[str, typing.Callable] = {}
+    deferredFields: list[str] = []
+    rowCache: RowCache | None = None
+    referenceTable: ReferenceTable | None = None
+    invalidationBus: InvalidationBus | None = None
+    listingCache: ResponseCache | None = None
+    # bumped on every write, cached responses are keyed by the versions 
+    # of the collections they show
+    dataVersion: int = 0
 
     @validate_types
     def __init__(self, request: fastapi.Request):
@@ -116,30 +137,260 @@ class BaseCollection(ExtensibleViewsApp):
                      modify_workflow_status: bool=False) -> pydantic.BaseModel:
         raise NotImplementedError
 
-    async def _get_by_field(self, field, value, secure: bool = True) -> pydantic.BaseModel:
+    async def _fetch_row(self, field, value, secure: bool = True, 
+                         fields: list[str] | None = None) -> tuple[dict | None, bool]:
+        # raw row and whether it passes the permission filters
+        raise NotImplementedError
+
+    async def _fetch_rows(self) -> list[dict]:
+        # every raw row of the table, ordered by id
         raise NotImplementedError
+
+    async def _get_by_field(self, field, value, secure: bool = True, fields: list[str] | None = None) -> pydantic.BaseModel:
+        reference = await self._reference_table(secure)
+        if reference is not None:
+            rows = reference.find(field, [value])
+            if not rows:
+                return None
+            return self.model_construct(self._project(rows[0], fields))
+        if self.rowCache is not None and field in CACHED_FIELDS:
+            data, permitted = await self._get_cached_row(field, value, secure, fields)
+        else:
+            data, permitted = await self._fetch_row(field, value, secure, fields=fields)
+        if data is None:
+            return None
+        if not permitted:
+            raise exc.Forbidden("You are not allowed to access this object")
+        return self.model_construct(data)
+
+    async def _get_cached_row(self, field, value, secure: bool = True, 
+                              fields: list[str] | None = None) -> tuple[dict | None, bool]:
+        # full rows are cached, the projection is applied on the copy handed out
+        key = await self.permission_key() if secure else None
+        cached = self.rowCache.get(field, value, key)
+        if cached is None:
+            version = self.rowCache.version
+            row, permitted = await self._fetch_row(field, value, secure)
+            if row is None:
+                return None, False
+            self.rowCache.set(row, key, permitted, version)
+        else:
+            row, permitted = cached
+        return self._project(row, fields), permitted
+
+    def _project(self, row: dict, fields: list[str] | None = None, 
+                 order_by: list[tuple[str,str]] | None = None) -> dict:
+        # copy of a row held in memory, decoders convert values in place
+        projection = self.projection(fields, order_by)
+        if projection is None:
+            return dict(row)
+        return dict((k, row[k]) for k in projection)
+
+    async def _reference_table(self, secure: bool = True) -> ReferenceTable | None:
+        # reference data is served from memory unless row permission filters
+        # apply, which can only be evaluated by the database
+        if self.referenceTable is None:
+            return None
+        if secure and await self.get_permission_filters():
+            return None
+        if not self.referenceTable.loaded:
+            version = self.referenceTable.version
+            self.referenceTable.load(await self._fetch_rows(), version)
+            if not self.referenceTable.loaded:
+                return None
+        return self.referenceTable
+
+    async def search_reference(self, query: str | None, offset: int = 0, limit: int | None = None, 
+                               order_by: list[tuple[str,str]] | None = None, secure: bool = True, 
+                               cursor: str | None = None, 
+                               fields: list[str] | None = None) -> tuple[list[pydantic.BaseModel], int] | None:
+        # listing page and total served from reference data, None when the 
+        # query has to run on the database
+        if cursor:
+            return None
+        reference = await self._reference_table(secure)
+        if reference is None:
+            return None
+        # rejects unknown fields even when no row is projected
+        self.projection(fields, order_by)
+        rows = reference.rows
+        if query:
+            restricted_fields = []
+            if secure:
+                field_permissions = await self.get_field_permissions()
+                restricted_fields = field_permissions[schema.FieldPermission.restricted]
+            match = match_query(query, self.Schema, restricted_fields)
+            if match is None:
+                return None
+            rows = [r for r in rows if match(r)]
+        if order_by:
+            for c, d in order_by:
+                # text is ordered by the database collation
+                if c not in self.Schema.model_fields or d.lower() not in ('asc', 'desc'):
+                    return None
+                if any(r[c] is None or isinstance(r[c], str) for r in rows):
+                    return None
+            rows = sort_rows(rows, order_by)
+        total = len(rows)
+        rows = rows[offset:offset + limit if limit is not None else None]
+        return [self.model_construct(self._project(r, fields, order_by)) for r in rows], total
+
+    def invalidate_rows(self, field, values: list):
+        self.invalidate_local(field, values)
+        # listings of related models are cached with the version of this one, 
+        # so writes are published whether this model caches anything or not
+        if self.invalidationBus is not None:
+            self.invalidationBus.publish(self.name, field, values)
+
+    @classmethod
+    def invalidate_local(cls, field: str | None, values: list | None):
+        # drops what this worker holds, a null field drops every cached row
+        cls.dataVersion += 1
+        if cls.listingCache is not None:
+            cls.listingCache.clear()
+        if cls.rowCache is not None:
+            cls.rowCache.invalidate(field, values)
+        if cls.referenceTable is not None:
+            cls.referenceTable.invalidate()
+
+    async def _get_many_by_field(self, field, values: list, secure: bool = True, 
+                                 fields: list[str] | None = None) -> list[pydantic.BaseModel]:
+        reference = await self._reference_table(secure)
+        if reference is not None:
+            return [self.model_construct(self._project(r, fields)) for r in reference.find(field, values)]
+        return await self._fetch_many_by_field(field, values, secure, fields=fields)
+
+    async def _fetch_many_by_field(self, field, values: list, secure: bool = True, 
+                                   fields: list[str] | None = None) -> list[pydantic.BaseModel]:
+        result = []
+        for value in values:
+            item = await self._get_by_field(field, value, secure, fields=fields)
+            if item is not None:
+                result.append(item)
+        return result
   
     @validate_types
-    async def get_by_id(self, id: int, secure: bool = True) -> pydantic.BaseModel:
-        return await self._get_by_field('id', id, secure)
+    async def get_by_id(self, id: int, secure: bool = True, fields: list[str] | None = None) -> pydantic.BaseModel:
+        return await self._get_by_field('id', id, secure, fields=fields)
 
     @validate_types
-    async def get(self, identifier: str | int, secure: bool=True) -> pydantic.BaseModel:
+    async def get(self, identifier: str | int, secure: bool=True, fields: list[str] | None = None) -> pydantic.BaseModel:
         if isinstance(identifier, int):
-            return await self._get_by_field('id', identifier, secure)
+            return await self._get_by_field('id', identifier, secure, fields=fields)
         if 'name' in self.Schema.model_fields.keys():
-            return await self._get_by_field('name', identifier, secure)
+            return await self._get_by_field('name', identifier, secure, fields=fields)
         try:
             identifier = int(identifier)
         except ValueError:
             return None
-        return await self.get_by_id(int(identifier), secure)
+        return await self.get_by_id(int(identifier), secure, fields=fields)
+
+    async def get_many(self, identifiers: list[str | int], secure: bool = True, 
+                       fields: list[str] | None = None) -> list[pydantic.BaseModel]:
+        # items in the order of their identifiers, missing ones are left out
+        field = self.identifier_field()
+        values = []
+        for identifier in identifiers:
+            try:
+                values.append(self.identifier_value(identifier))
+            except exc.NotFound:
+                continue
+        values = list(dict.fromkeys(values))
+        if not values:
+            return []
+        items = await self._get_many_by_field(field, values, secure, fields=fields)
+        found = dict((getattr(i, field), i) for i in items)
+        return [found[v] for v in values if v in found]
 
     @validate_types
     async def search(self, query: str | None, offset: int = 0, limit: int | None = None, 
-               order_by: list[tuple[str,str]] | None = None):
+               order_by: list[tuple[str,str]] | None = None, secure: bool = True, cursor: str | None = None,
+               fields: list[str] | None = None):
+        raise NotImplementedError
+
+    @validate_types
+    async def search_with_total(self, query: str | None, offset: int = 0, limit: int | None = None, 
+               order_by: list[tuple[str,str]] | None = None, secure: bool = True, cursor: str | None = None,
+               fields: list[str] | None = None):
+        total = await self.count(query=query, secure=secure)
+        items = await self.search(query=query, offset=offset, limit=limit, order_by=order_by, secure=secure, 
+                                  cursor=cursor, fields=fields)
+        return items, total
+
+    async def iterate(self, query: str | None, order_by: list[tuple[str,str]] | None = None, secure: bool = True,
+                      fields: list[str] | None = None, batch_size: int = 1000) -> typing.AsyncIterator[list[pydantic.BaseModel]]:
+        # yields every matching item in batches, storages that support 
+        # server side cursors override this to avoid paging with offsets
+        offset = 0
+        while True:
+            items = await self.search(query, offset=offset, limit=batch_size, order_by=order_by, 
+                                      secure=secure, fields=fields)
+            if items:
+                yield items
+            if len(items) < batch_size:
+                break
+            offset += batch_size
+
+    async def _search_filters(self, query: str | None, secure: bool = True) -> list:
+        raise NotImplementedError
+
+    async def validate_search(self, query: str | None, order_by: list[tuple[str,str]] | None = None, 
+                              fields: list[str] | None = None, secure: bool = True):
+        # resolves the search arguments without running the search, streamed 
+        # responses reject bad input before anything is sent
+        self.projection(fields, order_by)
+        for c, d in (order_by or []):
+            if c not in self.Schema.model_fields:
+                raise exc.ValidationError("Invalid sort field '%s'" % c)
+            if d.lower() not in ('asc', 'desc'):
+                raise exc.ValidationError("Invalid sort direction '%s'" % d)
+        await self._search_filters(query, secure)
+
+    def listing_fields(self) -> list[str] | None:
+        # fields loaded for listings when no sparse fieldset is requested
+        if not self.deferredFields:
+            return None
+        return [f for f in self.Schema.model_fields.keys() if f not in self.deferredFields]
+
+    def projection(self, fields: list[str] | None, order_by: list[tuple[str,str]] | None = None) -> list[str] | None:
+        # fields to load for a sparse fieldset, along with the identifier 
+        # fields used for links, the modification time used for etags and
+        # the sort fields used for cursors
+        if fields is None:
+            return None
+        for f in fields:
+            if f not in self.Schema.model_fields:
+                raise exc.ValidationError("Invalid field '%s'" % f)
+        wanted = set(fields)
+        wanted.update(['id', 'dateModified'])
+        if 'name' in self.Schema.model_fields:
+            wanted.add('name')
+        wanted.update(c for c, d in (order_by or []))
+        return [f for f in self.Schema.model_fields.keys() if f in wanted]
+
+    def cursor_values(self, cursor: str, order_by: list[tuple[str,str]] | None) -> list:
+        cursor_order, values = decode_cursor(cursor)
+        order_by = [(c, d.lower()) for c, d in (order_by or [])]
+        if cursor_order != order_by:
+            raise exc.ValidationError("Cursor does not match sort order")
+        result = []
+        for (c, d), v in zip(order_by, values):
+            if c not in self.Schema.model_fields:
+                raise exc.ValidationError("Invalid sort field '%s'" % c)
+            try:
+                result.append(field_adapter(self.Schema, c).validate_python(v))
+            except pydantic.ValidationError:
+                raise exc.ValidationError("Invalid cursor")
+        return result
+
+    @validate_types
+    async def count(self, query: str | None, secure: bool = True) -> int:
         raise NotImplementedError
 
+    @validate_types
+    async def estimate_count(self, query: str | None, secure: bool = True) -> int:
+        return await self.count(query=query, secure=secure)
+
 
     async def _update_by_field(self, field, value, data: dict, secure: bool=True, modify_object_store_fields: bool=False, modify_workflow_status: bool =False):
         raise NotImplementedError
@@ -151,7 +402,7 @@ class BaseCollection(ExtensibleViewsApp):
     @validate_types
     async def update(self, identifier: str, data: dict, secure: bool = True, modify_object_store_fields: bool=False, modify_workflow_status: bool= False):
         if 'name' in self.Schema.model_fields.keys():
-            return await self._update_by_field('name', identifier, item, secure, modify_object_store_fields, modify_workflow_status=modify_workflow_status)
+            return await self._update_by_field('name', identifier, data, secure, modify_object_store_fields, modify_workflow_status=modify_workflow_status)
         try:
             identifier = int(identifier)
         except ValueError:
@@ -176,10 +427,160 @@ class BaseCollection(ExtensibleViewsApp):
         return await self.delete_by_id(int(identifier), secure)
 
 
+    def identifier_field(self) -> str:
+        if 'name' in self.Schema.model_fields.keys():
+            return 'name'
+        return 'id'
+
+    def identifier_value(self, identifier: str | int):
+        if self.identifier_field() == 'name':
+            return str(identifier)
+        try:
+            return int(identifier)
+        except ValueError:
+            raise exc.NotFound("Invalid identifier '%s'" % identifier)
+
+    async def _insert_many(self, rows: list[dict], secure: bool = True) -> list[pydantic.BaseModel]:
+        raise NotImplementedError
+
+    async def _update_many(self, field, updates: list[tuple[typing.Any, dict]], secure: bool = True) -> list[pydantic.BaseModel]:
+        raise NotImplementedError
+
+    async def _delete_many(self, field, values: list, secure: bool = True):
+        raise NotImplementedError
+
+    async def apply_batch_input(self, rows: list[dict]) -> list[dict]:
+        try:
+            await self.apply_batch_validators(rows)
+            return await self.apply_batch_field_input_transformers(rows)
+        except exc.AurelixException:
+            # a batch call rejects the whole batch, the items are run one by 
+            # one to report which of them failed
+            errors = []
+            for idx, data in enumerate(rows):
+                try:
+                    await self.apply_validators(data)
+                    await self.apply_field_input_transformers(data)
+                except exc.AurelixException as e:
+                    errors.append({'index': idx, 'detail': e.message})
+            if errors:
+                raise exc.ValidationError(errors)
+            raise
+
+    async def bulk_create(self, items: list[pydantic.BaseModel], secure: bool = True) -> list[pydantic.BaseModel]:
+        # validators, transformers and hooks run for every item before anything 
+        # is written, failures are reported together by item position and the 
+        # items are then written in a single transaction
+        rows = await self.apply_batch_input([i.model_dump() for i in items])
+        errors = []
+        for idx, data in enumerate(rows):
+            try:
+                rows[idx] = await self.complete_create_data(data, secure=secure)
+                await self.before_create(rows[idx])
+            except exc.AurelixException as e:
+                errors.append({'index': idx, 'detail': e.message})
+        if errors:
+            raise exc.ValidationError(errors)
+        if not rows:
+            return []
+        result = await self._insert_many(rows, secure=secure)
+        for item in result:
+            await self.after_create(item)
+        return result
+
+    async def bulk_update(self, updates: list[tuple[str | int, dict]], secure: bool = True) -> list[pydantic.BaseModel]:
+        field = self.identifier_field()
+        values = []
+        errors = []
+        for idx, (identifier, data) in enumerate(updates):
+            try:
+                values.append(self.identifier_value(identifier))
+            except exc.AurelixException as e:
+                errors.append({'index': idx, 'detail': e.message})
+        if errors:
+            raise exc.ValidationError(errors)
+        rows = await self.apply_batch_input([data for identifier, data in updates])
+        for idx, data in enumerate(rows):
+            try:
+                rows[idx] = await self.complete_update_data(data, secure=secure)
+                await self.before_update(rows[idx])
+            except exc.AurelixException as e:
+                errors.append({'index': idx, 'detail': e.message})
+        if errors:
+            raise exc.ValidationError(errors)
+        if not rows:
+            return []
+        result = await self._update_many(field, list(zip(values, rows)), secure=secure)
+        for item in result:
+            await self.after_update(item)
+        return result
+
+    async def bulk_delete(self, identifiers: list[str | int], secure: bool = True):
+        field = self.identifier_field()
+        values = []
+        errors = []
+        for idx, identifier in enumerate(identifiers):
+            try:
+                values.append(self.identifier_value(identifier))
+            except exc.NotFound as e:
+                errors.append({'index': idx, 'detail': e.message})
+        if errors:
+            raise exc.NotFound(errors)
+        items = await self._get_many_by_field(field, values, secure)
+        found = set(getattr(i, field) for i in items)
+        errors = [{'index': idx, 'detail': 'Could not found record with identifier = %s' % v} 
+                  for idx, v in enumerate(values) if v not in found]
+        if errors:
+            raise exc.NotFound(errors)
+        deleted = []
+        for item in items:
+            deleted.append(await self.transform_delete_data(item, secure=secure))
+            await self.before_delete(item)
+        if items:
+            await self._delete_many(field, values, secure=secure)
+        for data in deleted:
+            await self.after_delete(data)
+        return True
+
+    async def _permission_cache(self) -> dict:
+        # resolved permissions only depend on the collection and the identities of
+        # the request, so they are computed once per request instead of once per item
+        cache = getattr(self.request.state, 'permission_cache', None)
+        if cache is None:
+            cache = {}
+            self.request.state.permission_cache = cache
+        identities = await get_permission_identities(self.request)
+        return cache.setdefault((self.name, tuple(identities)), {})
+
+    async def permission_key(self) -> tuple:
+        # identifies the row visibility of the request, the permission filters
+        # with the identity values bound into them
+        cache = await self._permission_cache()
+        if 'key' not in cache:
+            filters = await self.get_permission_filters()
+            params = {}
+            if filters:
+                params = await get_permission_parameters(self.request)
+                params['roles'] = tuple(sorted(params['roles']))
+            cache['key'] = (tuple(filters), tuple(sorted(params.items())))
+        return cache['key']
+
+    async def visibility_key(self) -> tuple:
+        # identifies what the request can see of the collection, the visible
+        # rows and the field permissions
+        field_permissions = await self.get_field_permissions()
+        return (await self.permission_key(), 
+                tuple((str(k), tuple(v)) for k, v in field_permissions.items()))
+
     async def get_permission_filters(self) -> list[str]:
         if not self.permissionFilters:
             return []
-        
+        cache = await self._permission_cache()
+        if 'filters' not in cache:
+            cache['filters'] = await self._get_permission_filters()
+        return cache['filters']
+
+    async def _get_permission_filters(self) -> list[str]:
         identities = await get_permission_identities(self.request)
         has_filter = False
         for f in self.permissionFilters:
@@ -198,6 +599,22 @@ class BaseCollection(ExtensibleViewsApp):
         return []
     
     async def get_field_permissions(self) -> dict[schema.FieldPermission, list[str]]:
+        cache = await self._permission_cache()
+        if 'fields' not in cache:
+            cache['fields'] = await self._get_field_permissions()
+        return cache['fields']
+
+    async def get_protected_fields(self) -> list[str]:
+        cache = await self._permission_cache()
+        if 'protected' not in cache:
+            field_permissions = await self.get_field_permissions()
+            cache['protected'] = (
+                field_permissions[schema.FieldPermission.readOnly] + 
+                field_permissions[schema.FieldPermission.restricted]
+            )
+        return cache['protected']
+
+    async def _get_field_permissions(self) -> dict[schema.FieldPermission, list[str]]:
         result: dict[schema.FieldPermission, list[str]] = {
             schema.FieldPermission.readOnly: [],
             schema.FieldPermission.readWrite: [],
@@ -235,24 +652,28 @@ class BaseCollection(ExtensibleViewsApp):
     async def _transform_output_data(self, data: dict) -> dict:
         return data
     
-    async def transform_output_data(self, item: pydantic.BaseModel) -> dict:
+    async def transform_output_data(self, item: pydantic.BaseModel, fields: list[str] | None = None) -> dict:
+        result = await self.transform_output_items([item], fields=fields)
+        return result[0]
 
-        field_permissions = await self.get_field_permissions()
+    async def transform_output_items(self, items: list[pydantic.BaseModel], fields: list[str] | None = None) -> list[dict]:
+        # output transformers are called once for the whole list of items
 
         # delete protected fields
-        protected_fields = (
-            field_permissions[schema.FieldPermission.readOnly] + 
-            field_permissions[schema.FieldPermission.restricted]
-        )
-
-        data = item.model_dump()
-        data = await self.apply_field_output_transformers(data)
-        for k in protected_fields:
-            if k in data: 
-                if data[k]:
-                    del data[k]
-
-        return await self._transform_output_data(data)
+        protected_fields = await self.get_protected_fields()
+
+        rows = [i.model_dump() for i in items]
+        if fields is not None:
+            rows = [dict((k, v) for k, v in data.items() if k in fields) for data in rows]
+        rows = await self.apply_batch_field_output_transformers(rows)
+        result = []
+        for data in rows:
+            for k in protected_fields:
+                if k in data: 
+                    if data[k]:
+                        del data[k]
+            result.append(await self._transform_output_data(data))
+        return result
 
     async def _transform_create_data(self, data: dict, secure: bool = True) -> dict:
         return data
@@ -278,13 +699,38 @@ class BaseCollection(ExtensibleViewsApp):
         data = data.copy()
         if self.fieldTransformers.outputTransformers:
             for field, transform in self.fieldTransformers.outputTransformers.items():
-                data[field] = await transform(self, data[field], data)
+                if field in data:
+                    data[field] = await transform(self, data[field], data)
         return data
 
+    async def apply_batch_validators(self, rows: list[dict]):
+        rows = [data.copy() for data in rows]
+        if self.validators.fields:
+            for fname, fvalidator in self.validators.fields.items():
+                present = [data for data in rows if fname in data]
+                if present:
+                    await call_batch(fvalidator, self, [data[fname] for data in present], present)
+        if self.validators.model and rows:
+            await call_batch(self.validators.model, self, rows)
+
+    async def _apply_batch_transformers(self, transformers: dict[str, typing.Callable], rows: list[dict]) -> list[dict]:
+        rows = [data.copy() for data in rows]
+        for field, transform in transformers.items():
+            present = [data for data in rows if field in data]
+            if present:
+                values = await call_batch(transform, self, [data[field] for data in present], present)
+                for data, value in zip(present, values):
+                    data[field] = value
+        return rows
+
+    async def apply_batch_field_input_transformers(self, rows: list[dict]) -> list[dict]:
+        return await self._apply_batch_transformers(self.fieldTransformers.inputTransformers or {}, rows)
+
+    async def apply_batch_field_output_transformers(self, rows: list[dict]) -> list[dict]:
+        return await self._apply_batch_transformers(self.fieldTransformers.outputTransformers or {}, rows)
+
     async def apply_field_guards(self, data, modify_object_store_fields: bool = False, 
                                  modify_workflow_status: bool=False):
-        field_permissions = await self.get_field_permissions()
-
         # delete internal fields
         internal_fields = schema.CoreModel.model_fields.keys()
 
@@ -292,10 +738,7 @@ class BaseCollection(ExtensibleViewsApp):
             if k in data: del data[k]
 
         # reject protected fields
-        protected_fields = (
-            field_permissions[schema.FieldPermission.readOnly] + 
-            field_permissions[schema.FieldPermission.restricted] 
-        )
+        protected_fields = await self.get_protected_fields()
 
         for k in protected_fields:
             if k in data: 
@@ -323,6 +766,13 @@ class BaseCollection(ExtensibleViewsApp):
         data = item.model_dump()
         await self.apply_validators(data)
         data = await self.apply_field_input_transformers(data)
+        return await self.complete_create_data(data, secure=secure, modify_object_store_fields=modify_object_store_fields,
+                                               modify_workflow_status=modify_workflow_status)
+
+    async def complete_create_data(self, data: dict, secure: bool = True, 
+                                   modify_object_store_fields=False,
+                                   modify_workflow_status=False) -> dict:
+        # create data after validators and field input transformers
         data = await self._transform_create_data(data)
         if secure:
             if not modify_workflow_status:
@@ -354,6 +804,12 @@ class BaseCollection(ExtensibleViewsApp):
                                     modify_object_store_fields=False, modify_workflow_status: bool=False) -> dict:
         await self.apply_validators(data)
         data = await self.apply_field_input_transformers(data)
+        return await self.complete_update_data(data, secure=secure, modify_object_store_fields=modify_object_store_fields,
+                                               modify_workflow_status=modify_workflow_status)
+
+    async def complete_update_data(self, data: dict, secure: bool=True, 
+                                   modify_object_store_fields=False, modify_workflow_status: bool=False) -> dict:
+        # update data after validators and field input transformers
         data = await self._transform_update_data(data)
         if secure:
             data = await self.apply_field_guards(data, modify_object_store_fields=modify_object_store_fields,
@@ -395,6 +851,23 @@ class BaseCollection(ExtensibleViewsApp):
     def model_validate(self, obj):
         return self.Schema.model_validate(obj)
 
+    def model_construct(self, data: dict):
+        # trusted decode for rows read from our own typed storage. Only the
+        # values which storage returns in a different type than the schema 
+        # (eg: enums) are converted, the instance is then set up the way 
+        # pydantic's model_construct() does, minus its per field default 
+        # handling as rows always carry every column
+        for field, decode in self.fieldDecoders.items():
+            value = data.get(field, None)
+            if value is not None:
+                data[field] = decode(value)
+        item = object.__new__(self.Schema)
+        object.__setattr__(item, '__dict__', data)
+        object.__setattr__(item, '__pydantic_fields_set__', set(data))
+        object.__setattr__(item, '__pydantic_extra__', None)
+        object.__setattr__(item, '__pydantic_private__', None)
+        return item
+
     async def get_presigned_upload_url(self, identifier, field) -> str:
         if field not in self.objectStore:
             raise exc.NotFound("No such object store field %s" % field)
@@ -0,0 +1,120 @@
+import collections
+import time
+import typing
+from .. import schema
+
+# In-process read-through cache of raw rows for models with a `cache` spec.
+# Rows are stored by id with an index on name, together with whether they
+# were visible under each permission key (the permission filters of a
+# request and their identity parameters) they have been read with.
+
+CACHED_FIELDS = ('id', 'name')
+
+class CacheEntry(typing.NamedTuple):
+    row: dict
+    permitted: dict
+    expires: float
+
+class RowCache(object):
+
+    def __init__(self, max_size: int = 1000, ttl: float | None = 60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: collections.OrderedDict[typing.Any, CacheEntry] = collections.OrderedDict()
+        self.names = {}
+        # bumped on every invalidation, a read which started before a write
+        # must not store the row it got
+        self.version = 0
+
+    def _id(self, field: str, value):
+        if field == 'name':
+            return self.names.get(value, None)
+        return value
+
+    def get(self, field: str, value, key) -> tuple[dict, bool] | None:
+        id = self._id(field, value)
+        entry = self.entries.get(id, None)
+        if entry is None:
+            return None
+        if entry.expires < time.monotonic():
+            self._remove(id)
+            return None
+        if key not in entry.permitted:
+            return None
+        self.entries.move_to_end(id)
+        return entry.row, entry.permitted[key]
+
+    def set(self, row: dict, key, permitted: bool, version: int):
+        if version != self.version:
+            return
+        id = row['id']
+        entry = self.entries.get(id, None)
+        if entry is None or entry.expires < time.monotonic():
+            expires = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+            entry = CacheEntry(row, {}, expires)
+        entry.permitted[key] = permitted
+        self.entries[id] = CacheEntry(row, entry.permitted, entry.expires)
+        self.entries.move_to_end(id)
+        if row.get('name', None) is not None:
+            self.names[row['name']] = id
+        while len(self.entries) > self.max_size:
+            self._remove(next(iter(self.entries)))
+
+    def _remove(self, id):
+        entry = self.entries.pop(id, None)
+        if entry is not None and entry.row.get('name', None) is not None:
+            self.names.pop(entry.row['name'], None)
+
+    def invalidate(self, field: str, values: list):
+        self.version += 1
+        if field not in CACHED_FIELDS:
+            self.clear()
+            return
+        for value in values:
+            id = self._id(field, value)
+            if id is not None:
+                self._remove(id)
+
+    def clear(self):
+        self.version += 1
+        self.entries.clear()
+        self.names.clear()
+
+def row_cache(spec: schema.CacheSpec | None) -> RowCache | None:
+    if spec is None:
+        return None
+    return RowCache(max_size=spec.maxSize, ttl=spec.ttl)
+
+class ResponseCache(object):
+    """Listing responses by their normalized parameters, the permissions of the
+    caller and the data versions of the collections they show"""
+
+    def __init__(self, max_size: int = 1000, ttl: float | None = 10):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries: collections.OrderedDict[typing.Any, tuple[float, typing.Any]] = collections.OrderedDict()
+
+    def get(self, key) -> typing.Any | None:
+        entry = self.entries.get(key, None)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else float('inf')
+        self.entries[key] = (expires, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+def response_cache(spec: schema.ListingCacheSpec | None) -> ResponseCache | None:
+    if spec is None:
+        return None
+    return ResponseCache(max_size=spec.maxSize, ttl=spec.ttl)
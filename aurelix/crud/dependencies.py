@@ -15,22 +15,32 @@ async def get_collection(request: fastapi.Request, name: str = None) -> BaseColl
         raise exc.CollectionNotFoundException(request.url.path)
     return request.app.collection[name](request)
 
+def internal_request(app: fastapi.FastAPI, name: str) -> fastapi.Request:
+    # collections are bound to a request, work done outside of client requests
+    # (startup, command line) gets one without identity
+    return fastapi.Request({
+        'type': 'http', 'app': app, 'method': 'POST', 'scheme': 'http', 'server': ('localhost', 80),
+        'path': '/%s/' % name, 'root_path': '', 'query_string': b'', 'headers': []
+    })
+
 async def _get_collection(request: fastapi.Request):
     return await get_collection(request)
 
 Collection = typing.Annotated[BaseCollection, fastapi.Depends(_get_collection)]
 
-async def get_model(request: fastapi.Request, collection: Collection):
-    if not 'identifier' in request.path_params:
-        raise exc.AurelixException(r'{identifier} parameter is required on this route to resolve model')
-    identifier = request.path_params['identifier']
+async def load_model(collection: BaseCollection, identifier: str, fields: list[str] | None = None):
     if identifier.startswith('+'):
         raise exc.RecordNotFoundException(identifier)
-    obj = await collection.get(identifier)
+    obj = await collection.get(identifier, fields=fields)
     if not obj:
         raise exc.RecordNotFoundException(identifier)
     return obj
 
+async def get_model(request: fastapi.Request, collection: Collection):
+    if not 'identifier' in request.path_params:
+        raise exc.AurelixException(r'{identifier} parameter is required on this route to resolve model')
+    return await load_model(collection, request.path_params['identifier'])
+
 Model = typing.Annotated[schema.CoreModel, fastapi.Depends(get_model)]
 
 class AurelixApp(fastapi.FastAPI):
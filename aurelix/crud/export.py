@@ -0,0 +1,106 @@
+import csv
+import io
+import json
+import enum
+import datetime
+import typing
+import pydantic
+import fastapi
+from fastapi.responses import StreamingResponse
+from .. import schema
+from .. import exc
+from ..utils import dump_json
+from .base import BaseCollection
+
+EXPORT_BATCH_SIZE = 1000
+
+MEDIA_TYPES = {
+    schema.ExportFormat.ndjson: 'application/x-ndjson',
+    schema.ExportFormat.csv: 'text/csv',
+    schema.ExportFormat.arrow: 'application/vnd.apache.arrow.stream',
+    schema.ExportFormat.parquet: 'application/vnd.apache.parquet',
+}
+
+def negotiate_format(request: fastapi.Request, format: schema.ExportFormat | None = None) -> schema.ExportFormat | None:
+    # explicit format parameter first, then the first supported media type 
+    # listed in the Accept header
+    if format is not None:
+        return format
+    for media_type in request.headers.get('accept', '').split(','):
+        media_type = media_type.split(';')[0].strip()
+        for f, m in MEDIA_TYPES.items():
+            if media_type == m:
+                return f
+    return None
+
+def arrow_module():
+    try:
+        from . import arrow
+    except ImportError:
+        raise exc.NotAcceptable("Arrow and Parquet responses require pyarrow to be installed")
+    return arrow
+
+async def export_columns(col: BaseCollection, fields: list[str] | None) -> list[str]:
+    field_permissions = await col.get_field_permissions()
+    restricted = field_permissions[schema.FieldPermission.restricted]
+    return [f for f in (fields or col.Schema.model_fields.keys()) if f not in restricted]
+
+async def output_batches(col: BaseCollection, batches: typing.AsyncIterator[list[pydantic.BaseModel]],
+                         fields: list[str] | None) -> typing.AsyncIterator[list[dict]]:
+    async for items in batches:
+        yield await col.transform_output_items(items, fields=fields)
+
+async def ndjson_stream(batches: typing.AsyncIterator[list[dict]]) -> typing.AsyncIterator[bytes]:
+    async for rows in batches:
+        yield b''.join(dump_json(r) + b'\n' for r in rows)
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=str)
+    return value
+
+async def csv_stream(batches: typing.AsyncIterator[list[dict]], columns: list[str]) -> typing.AsyncIterator[str]:
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, columns, extrasaction='ignore')
+    writer.writeheader()
+    async for rows in batches:
+        for r in rows:
+            writer.writerow(dict((k, csv_value(v)) for k, v in r.items()))
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+async def stream_response(col: BaseCollection, items: typing.AsyncIterator[list[pydantic.BaseModel]],
+                          fields: list[str] | None, format: schema.ExportFormat,
+                          headers: dict[str, str] | None = None) -> StreamingResponse:
+    # field permissions are resolved before the items are iterated, as
+    # storage cursors hold their connection until the stream completes
+    columns = await export_columns(col, fields)
+    batches = output_batches(col, items, fields)
+    if format == schema.ExportFormat.csv:
+        content = csv_stream(batches, columns)
+    elif format == schema.ExportFormat.arrow:
+        arrow = arrow_module()
+        content = arrow.arrow_stream(batches, arrow.arrow_schema(col.spec, columns))
+    elif format == schema.ExportFormat.parquet:
+        arrow = arrow_module()
+        content = arrow.parquet_stream(batches, arrow.arrow_schema(col.spec, columns))
+    else:
+        content = ndjson_stream(batches)
+    return StreamingResponse(content, media_type=MEDIA_TYPES[format], headers=headers)
+
+async def export_response(col: BaseCollection, query: str | None, order_by: list[tuple[str,str]],
+                          fields: list[str] | None, format: schema.ExportFormat) -> StreamingResponse:
+    # iterate() only runs once the response body is sent
+    await col.validate_search(query, order_by=order_by, fields=fields)
+    items = col.iterate(query, order_by=order_by, fields=fields, batch_size=EXPORT_BATCH_SIZE)
+    headers = {'Content-Disposition': 'attachment; filename="%s.%s"' % (col.name, format.value)}
+    return await stream_response(col, items, fields, format, headers=headers)
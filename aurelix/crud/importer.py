@@ -0,0 +1,289 @@
+import csv
+import datetime
+import enum
+import io
+import itertools
+import json
+import os
+import time
+import typing
+import fastapi
+import sqlalchemy as sa
+from .. import schema
+from .. import exc
+from .. import state
+from .base import BaseCollection
+from .dependencies import internal_request
+
+# Bulk loading of CSV, NDJSON, Arrow and Parquet files (as written by the
+# export view) into the table of a model, bypassing the API. Rows are written
+# in batches through COPY on PostgreSQL and executemany() elsewhere, each
+# batch in its own transaction.
+
+IMPORT_BATCH_SIZE = 10000
+
+FILE_FORMATS = {
+    '.csv': schema.ExportFormat.csv,
+    '.ndjson': schema.ExportFormat.ndjson,
+    '.jsonl': schema.ExportFormat.ndjson,
+    '.arrow': schema.ExportFormat.arrow,
+    '.parquet': schema.ExportFormat.parquet,
+}
+
+CORE_TYPES = {
+    'id': 'integer',
+    'dateCreated': 'datetime',
+    'dateModified': 'datetime',
+    'creator': 'string',
+    'editor': 'string',
+}
+
+TEXT_TYPES = ('string', 'text', 'encrypted-string')
+
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y')
+FALSE_VALUES = ('0', 'false', 'f', 'no', 'n')
+
+# formats which carry json fields as json encoded strings
+JSON_TEXT_FORMATS = (schema.ExportFormat.csv, schema.ExportFormat.arrow, schema.ExportFormat.parquet)
+
+def file_format(path: str, format: schema.ExportFormat | None = None) -> schema.ExportFormat:
+    if format is not None:
+        return format
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FILE_FORMATS:
+        raise exc.AurelixException("Unable to detect format of %s, supported extensions are %s" % (
+            path, ', '.join(FILE_FORMATS.keys())))
+    return FILE_FORMATS[ext]
+
+def batched(rows: typing.Iterable[dict], batch_size: int) -> typing.Iterator[list[dict]]:
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        yield batch
+
+def read_csv(path: str, batch_size: int) -> typing.Iterator[list[dict]]:
+    with open(path, newline='') as f:
+        yield from batched(csv.DictReader(f), batch_size)
+
+def read_ndjson(path: str, batch_size: int) -> typing.Iterator[list[dict]]:
+    with open(path) as f:
+        yield from batched((json.loads(line) for line in f if line.strip()), batch_size)
+
+def pyarrow_module():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise exc.AurelixException("Importing Arrow and Parquet files requires pyarrow to be installed")
+    return pyarrow
+
+def read_arrow(path: str, batch_size: int) -> typing.Iterator[list[dict]]:
+    pa = pyarrow_module()
+    with pa.ipc.open_stream(pa.OSFile(path)) as reader:
+        rows = (r for b in reader for r in b.to_pylist())
+        yield from batched(rows, batch_size)
+
+def read_parquet(path: str, batch_size: int) -> typing.Iterator[list[dict]]:
+    pa = pyarrow_module()
+    for b in pa.parquet.ParquetFile(path).iter_batches(batch_size=batch_size):
+        yield b.to_pylist()
+
+READERS = {
+    schema.ExportFormat.csv: read_csv,
+    schema.ExportFormat.ndjson: read_ndjson,
+    schema.ExportFormat.arrow: read_arrow,
+    schema.ExportFormat.parquet: read_parquet,
+}
+
+def field_types(spec: schema.ModelSpec) -> dict[str, str]:
+    result = dict(CORE_TYPES)
+    for field_name, field in spec.fields.items():
+        result[field_name] = field.dataType.type
+    return result
+
+def decode_value(data_type: str, value, json_text: bool = True):
+    if not isinstance(value, str):
+        if isinstance(value, datetime.datetime) and value.tzinfo:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value
+    if value == '' and data_type not in TEXT_TYPES:
+        return None
+    if data_type in ('integer', 'biginteger'):
+        return int(value)
+    if data_type == 'float':
+        return float(value)
+    if data_type == 'boolean':
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+        raise ValueError("Invalid boolean value %r" % value)
+    if data_type == 'datetime':
+        return decode_value(data_type, datetime.datetime.fromisoformat(value))
+    if data_type == 'date':
+        return datetime.date.fromisoformat(value)
+    if data_type == 'json':
+        return json.loads(value) if json_text else value
+    return value
+
+def decode_rows(spec: schema.ModelSpec, rows: list[dict], keep_ids: bool = False, json_text: bool = True,
+                empty_as_null: bool = False, offset: int = 0) -> list[dict]:
+    # every row gets every field, missing fields take the field default as
+    # they would on create, columns which are not model fields are ignored.
+    # csv has no null, empty values are read as null except on required 
+    # text fields. offset is the number of rows read before this batch, for
+    # error messages
+    types = field_types(spec)
+    keep_empty = set(k for k, f in spec.fields.items() if f.required and f.dataType.type in TEXT_TYPES)
+    if not keep_ids:
+        del types['id']
+    defaults = dict((k, None) for k in types.keys())
+    defaults.update((k, f.default) for k, f in spec.fields.items())
+    now = datetime.datetime.utcnow()
+    result = []
+    for idx, row in enumerate(rows):
+        data = dict(defaults)
+        for k, v in row.items():
+            if k in types:
+                if empty_as_null and v == '' and k not in keep_empty:
+                    v = None
+                try:
+                    data[k] = decode_value(types[k], v, json_text)
+                except (ValueError, TypeError) as e:
+                    raise exc.ValidationError("Row %s: invalid value for %s: %s" % (offset + idx + 1, k, e))
+        if data['dateCreated'] is None:
+            data['dateCreated'] = now
+        if data['dateModified'] is None:
+            data['dateModified'] = now
+        result.append(data)
+    return result
+
+def copy_value(value) -> str:
+    # csv formatted COPY value, NULL is the unquoted empty value
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        value = 't' if value else 'f'
+    elif isinstance(value, enum.Enum):
+        value = value.value
+    elif isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.isoformat()
+    elif isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return '"%s"' % str(value).replace('"', '""')
+
+def copy_rows(engine: sa.engine.Engine, table: sa.Table, rows: list[dict]):
+    # column bind processors (json, encrypted-string) are applied here as
+    # COPY does not go through sqlalchemy
+    columns = list(rows[0].keys())
+    processors = [table.c[c].type.bind_processor(engine.dialect) for c in columns]
+    buf = io.StringIO()
+    for row in rows:
+        values = []
+        for c, process in zip(columns, processors):
+            value = row[c]
+            if process is not None and value is not None:
+                value = process(value)
+            values.append(copy_value(value))
+        buf.write(','.join(values) + '\n')
+    buf.seek(0)
+    preparer = engine.dialect.identifier_preparer
+    statement = 'COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (
+        preparer.format_table(table), ', '.join(preparer.quote(c) for c in columns))
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.copy_expert(statement, buf)
+        conn.commit()
+    finally:
+        conn.close()
+
+def insert_rows(engine: sa.engine.Engine, table: sa.Table, rows: list[dict]):
+    with engine.begin() as conn:
+        conn.execute(table.insert(), rows)
+
+def rejected_row(engine: sa.engine.Engine, table: sa.Table, rows: list[dict]) -> tuple[int, Exception] | None:
+    # replays a rejected batch row by row in a transaction which is rolled
+    # back, to find the offending row
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            for idx, row in enumerate(rows):
+                try:
+                    conn.execute(table.insert(), row)
+                except sa.exc.DBAPIError as e:
+                    return idx, e.orig
+        finally:
+            trans.rollback()
+    return None
+
+def supports_copy(engine: sa.engine.Engine) -> bool:
+    return engine.dialect.name == 'postgresql' and engine.dialect.driver == 'psycopg2'
+
+def reset_id_sequence(engine: sa.engine.Engine, table: sa.Table):
+    # imported ids do not advance the id sequence of postgresql tables
+    if engine.dialect.name != 'postgresql':
+        return
+    with engine.begin() as conn:
+        conn.execute(sa.select(sa.func.setval(
+            sa.func.pg_get_serial_sequence(table.name, 'id'),
+            sa.select(sa.func.coalesce(sa.func.max(table.c.id), 1)).scalar_subquery())))
+
+class ImportProgress(typing.NamedTuple):
+    rows: int
+    seconds: float
+
+    @property
+    def rate(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+async def import_file(app: fastapi.FastAPI, model: str, path: str, format: schema.ExportFormat | None = None,
+                      batch_size: int = IMPORT_BATCH_SIZE, validate: bool = False, transform: bool = False,
+                      keep_ids: bool = False,
+                      progress: typing.Callable[[ImportProgress], None] | None = None) -> ImportProgress:
+    specs: dict[str, schema.ModelSpec] = state.APP_STATE[app]['models']
+    if model not in specs:
+        raise exc.AurelixException("Unknown model %s" % model)
+    spec = specs[model]
+    col: BaseCollection = app.collection[model](internal_request(app, model))
+    engine: sa.engine.Engine = state.APP_STATE[app]['databases'][spec.storageType.database]['engine']
+    write = copy_rows if supports_copy(engine) else insert_rows
+    format = file_format(path, format)
+    reader = READERS[format]
+
+    dbapi_error = (sa.exc.DBAPIError, engine.dialect.dbapi.Error)
+
+    start = time.perf_counter()
+    count = 0
+    for rows in reader(path, batch_size):
+        rows = decode_rows(spec, rows, keep_ids=keep_ids, json_text=format in JSON_TEXT_FORMATS,
+                           empty_as_null=format == schema.ExportFormat.csv, offset=count)
+        try:
+            if validate:
+                await col.apply_batch_validators(rows)
+            if transform:
+                rows = await col.apply_batch_field_input_transformers(rows)
+        except exc.AurelixException as e:
+            raise exc.ValidationError("Rows %s to %s rejected: %s" % (count + 1, count + len(rows), e.message))
+        try:
+            write(engine, col.table, rows)
+        except dbapi_error as e:
+            # earlier batches are already committed
+            rejected = rejected_row(engine, col.table, rows)
+            if rejected is None:
+                raise exc.ValidationError("Rows %s to %s rejected: %s" % (
+                    count + 1, count + len(rows), getattr(e, 'orig', e)))
+            idx, error = rejected
+            raise exc.ValidationError("Row %s: %s (%s rows imported before it)" % (
+                count + idx + 1, str(error).strip(), count))
+        count += len(rows)
+        if progress:
+            progress(ImportProgress(count, time.perf_counter() - start))
+    if keep_ids and count:
+        reset_id_sequence(engine, col.table)
+    if count:
+        # other workers drop what they cached of the model
+        col.invalidate_rows(None, None)
+    return ImportProgress(count, time.perf_counter() - start)
@@ -0,0 +1,227 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import tempfile
+import typing
+import uuid
+from .. import schema
+from .. import exc
+
+# Cached rows and reference data are held by every worker process, writes of
+# one worker are announced to the others through an invalidation bus.
+# Messages carry the model, the identifier field and the written values, a
+# null field asks for every cached row of the model to be dropped.
+
+logger = logging.getLogger('aurelix.invalidation')
+
+# larger messages are replaced by one dropping every cached row of the model
+MAX_MESSAGE_SIZE = 65000
+
+# seconds between attempts to reach a worker whose queue was full
+RETRY_INTERVAL = 0.05
+
+# seconds stop() waits on a full queue for the pending messages
+FLUSH_TIMEOUT = 1.0
+
+Handler = typing.Callable[[dict], None]
+
+def encode_message(model: str, field: str | None, values: list | None, origin: str) -> bytes:
+    data = json.dumps({'model': model, 'field': field, 'values': values, 'origin': origin},
+                      default=str).encode('utf8')
+    if len(data) > MAX_MESSAGE_SIZE:
+        return encode_message(model, None, None, origin)
+    return data
+
+class InvalidationBus(object):
+    """In-process only, for a single worker"""
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self.handler: Handler | None = None
+
+    async def start(self, handler: Handler):
+        self.handler = handler
+
+    def publish(self, model: str, field: str | None, values: list | None):
+        pass
+
+    async def stop(self):
+        pass
+
+    def receive(self, data: bytes):
+        message = json.loads(data)
+        if message['origin'] == self.origin or self.handler is None:
+            return
+        self.handler(message)
+
+class UnixSocketBus(InvalidationBus):
+    """Datagram broadcast to the other workers on this host, each worker binds
+    a socket in a shared directory. A message which does not fit the queue of 
+    a busy worker is replaced by one dropping every cached row of the model, 
+    sent again until the worker catches up"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.address = os.path.join(path, '%s.sock' % self.origin)
+        self.sock: socket.socket | None = None
+        # address -> models to drop entirely
+        self.pending: dict[str, set[str]] = {}
+        self.retry: asyncio.TimerHandle | None = None
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        os.makedirs(self.path, exist_ok=True)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.address)
+        self.sock.setblocking(False)
+        asyncio.get_running_loop().add_reader(self.sock.fileno(), self._read)
+
+    def _read(self):
+        while True:
+            try:
+                data = self.sock.recv(MAX_MESSAGE_SIZE + 1024)
+            except BlockingIOError:
+                return
+            try:
+                self.receive(data)
+            except Exception:
+                logger.exception("Unable to apply invalidation message")
+
+    def publish(self, model: str, field: str | None, values: list | None):
+        if self.sock is None:
+            return
+        data = encode_message(model, field, values, self.origin)
+        for name in os.listdir(self.path):
+            address = os.path.join(self.path, name)
+            if address == self.address or not name.endswith('.sock'):
+                continue
+            if address in self.pending:
+                # queued behind a drop of the whole model
+                self.pending[address].add(model)
+                continue
+            try:
+                self.sock.sendto(data, address)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._remove_peer(address)
+            except BlockingIOError:
+                logger.warning("Invalidation queue of %s is full, retrying" % address)
+                self.pending[address] = {model}
+        self._schedule_retry()
+
+    def _remove_peer(self, address: str):
+        # worker is gone
+        self.pending.pop(address, None)
+        try:
+            os.unlink(address)
+        except FileNotFoundError:
+            pass
+
+    def _send_pending(self):
+        for address, models in list(self.pending.items()):
+            try:
+                while models:
+                    model = next(iter(models))
+                    self.sock.sendto(encode_message(model, None, None, self.origin), address)
+                    models.discard(model)
+            except (ConnectionRefusedError, FileNotFoundError):
+                self._remove_peer(address)
+            except (BlockingIOError, TimeoutError):
+                continue
+            del self.pending[address]
+
+    def _retry(self):
+        self.retry = None
+        if self.sock is None:
+            return
+        self._send_pending()
+        self._schedule_retry()
+
+    def _schedule_retry(self):
+        if self.pending and self.retry is None:
+            self.retry = asyncio.get_running_loop().call_later(RETRY_INTERVAL, self._retry)
+
+    async def stop(self):
+        if self.sock is None:
+            return
+        if self.retry is not None:
+            self.retry.cancel()
+            self.retry = None
+        asyncio.get_running_loop().remove_reader(self.sock.fileno())
+        if self.pending:
+            # last chance for workers which are still busy
+            self.sock.settimeout(FLUSH_TIMEOUT)
+            self._send_pending()
+            for address in self.pending:
+                logger.warning("Invalidation messages to %s dropped, its queue is full" % address)
+            self.pending.clear()
+        self.sock.close()
+        self.sock = None
+        try:
+            os.unlink(self.address)
+        except FileNotFoundError:
+            pass
+
+class RedisBus(InvalidationBus):
+    """Redis pub/sub channel, for workers spread over several hosts"""
+
+    def __init__(self, url: str, channel: str):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self.client = None
+        self.task: asyncio.Task | None = None
+        self.pending: set[asyncio.Task] = set()
+
+    async def start(self, handler: Handler):
+        await super().start(handler)
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise exc.AurelixException("The redis invalidation backend requires redis to be installed")
+        self.client = redis.asyncio.from_url(self.url)
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        self.task = asyncio.create_task(self._listen(pubsub))
+
+    async def _listen(self, pubsub):
+        async for message in pubsub.listen():
+            if message['type'] != 'message':
+                continue
+            try:
+                self.receive(message['data'])
+            except Exception:
+                logger.exception("Unable to apply invalidation message")
+
+    def publish(self, model: str, field: str | None, values: list | None):
+        if self.client is None:
+            return
+        # write paths do not wait for the broker
+        task = asyncio.get_running_loop().create_task(
+            self.client.publish(self.channel, encode_message(model, field, values, self.origin)))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        if self.pending:
+            await asyncio.gather(*self.pending, return_exceptions=True)
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+def invalidation_bus(spec: schema.InvalidationSpec | None) -> InvalidationBus | None:
+    if spec is None:
+        return None
+    if spec.backend == schema.InvalidationBackend.unix:
+        return UnixSocketBus(spec.path or os.path.join(tempfile.gettempdir(), 'aurelix-invalidation'))
+    if spec.backend == schema.InvalidationBackend.redis:
+        url = spec.url or (os.environ[spec.url_env] if spec.url_env else None)
+        if not url:
+            raise exc.AurelixException("Missing redis url for invalidation bus")
+        return RedisBus(url, spec.channel)
+    return InvalidationBus()
@@ -10,13 +10,16 @@ import sqlalchemy as sa
 import sqlalchemy_utils as sautils
 import pydantic
 import importlib
-from ..utils import validate_types, snake_to_pascal, snake_to_camel
-from .sqla import SQLACollection, EncryptedString
+from ..utils import validate_types, snake_to_pascal, snake_to_camel, unvalidated_methods
+from .sqla import SQLACollection, EncryptedString, compile_permission_filters
 from .asyncsqla import AsyncSQLACollection
 from .base import StateMachine, ExtensibleViewsApp, BaseCollection, FieldObjectStore
 from .routes import register_collection
-from .dependencies import get_collection, Collection, Model, App
+from .dependencies import get_collection, internal_request, Collection, Model, App
 from .minios3 import MinioS3
+from .cache import row_cache, response_cache
+from .reference import reference_table
+from .invalidation import invalidation_bus
 from ..dependencies import Token
 from ..exc import AurelixException
 from ..settings import Settings
@@ -35,6 +38,8 @@ import datetime
 from .base import ModelValidators, ModelFieldTransformers
 import jwt
 import logging
+import concurrent.futures
+import functools
 
 logger = logging.getLogger('aurelix.lowcode')
 
@@ -63,6 +68,8 @@ SA_TYPES={
     'json': sautils.types.JSONType,
 }
 
+DEFERRABLE_TYPES = ['text', 'json', 'encrypted-string']
+
 def get_sa_type_factory(field_name: str, app_spec: schema.AppSpec, field_spec: schema.FieldSpec):
     field_type = field_spec.dataType.type
     type_factory = SA_TYPES.get(field_type, None)
@@ -73,6 +80,34 @@ def get_sa_type_factory(field_name: str, app_spec: schema.AppSpec, field_spec: s
     
     return type_factory
 
+def dialect_supports_returning(dialect) -> bool:
+    # MSSQL OUTPUT clause can't evaluate the plain column references used in permission filters
+    if dialect.name not in ('postgresql', 'sqlite', 'mysql', 'mariadb'):
+        return False
+    # sqlalchemy 2.x, sqlite >= 3.35 (mariadb has no UPDATE .. RETURNING)
+    if hasattr(dialect, 'insert_returning'):
+        return bool(dialect.insert_returning and dialect.update_returning)
+    # sqlalchemy 1.4 only compiles RETURNING for postgresql here
+    return bool(getattr(dialect, 'full_returning', False))
+
+def dialect_sorts_nulls_high(dialect) -> bool:
+    # default position of NULL in ORDER BY, needed to continue keyset pages 
+    # after a row with a NULL sort value
+    return dialect.name in ('postgresql', 'oracle')
+
+def dialect_supports_window_functions(dialect) -> bool:
+    if dialect.name == 'sqlite':
+        return dialect.dbapi.sqlite_version_info >= (3, 25)
+    if dialect.name in ('mysql', 'mariadb'):
+        # version is only known once connected, 
+        # mysql < 8.0 and mariadb < 10.2 have no window functions
+        version = dialect.server_version_info
+        if not version:
+            return False
+        if getattr(dialect, 'is_mariadb', False):
+            return version >= (10, 2)
+        return version >= (8, 0)
+    return dialect.name in ('postgresql', 'mssql', 'oracle')
 
 def create_table(name, metadata, columns=None, indexes=None, constraints=None, *args):
     columns = columns or []
@@ -119,7 +154,8 @@ async def load_app(path: str) -> fastapi.FastAPI:
                           swagger_ui_init_oauth=init_oauth or None)
     state.APP_STATE.setdefault(app, {})
     state.APP_STATE[app]['settings'] = spec
-    state.APP_STATE[app]['views'] = ExtensibleViewsApp()
+    # dectate registers directives on the class, one subclass per app
+    state.APP_STATE[app]['views'] = type('AppViews', (ExtensibleViewsApp,), {})
 
     if spec.libs_directory:
         ld_path = os.path.join(spec_dir, spec.libs_directory)
@@ -139,7 +175,7 @@ async def load_app(path: str) -> fastapi.FastAPI:
         # FIXME: this check may be flaky
         is_mssql = url.lower().startswith('mssql')
         logger.warn('MSSQL support is limited to synchronous API')
-        if not is_mssql:
+        if url.lower().startswith('sqlite'):
             connect_args["check_same_thread"] = False
         engine = sa.create_engine(
             url, connect_args=connect_args
@@ -150,10 +186,13 @@ async def load_app(path: str) -> fastapi.FastAPI:
         if not is_mssql:
             db = databases.Database(url)
         state.APP_STATE[app].setdefault('databases', {})
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=d.thread_pool_size,
+                                                         thread_name_prefix='aurelix-db-%s' % d.name)
         state.APP_STATE[app]['databases'][d.name] = {
             'metadata': metadata,
             'engine': engine,
-            'db': db
+            'db': db,
+            'executor': executor
         }
 
     for o in (spec.objectStores or []):
@@ -183,6 +222,12 @@ async def load_app(path: str) -> fastapi.FastAPI:
             endpoint_url, access_key, secret_key
         )
 
+    bus = invalidation_bus(spec.invalidation)
+    if bus is not None:
+        state.APP_STATE[app]['invalidation_bus'] = bus
+        app.add_event_handler('startup', functools.partial(bus.start, functools.partial(apply_invalidation, app)))
+        app.add_event_handler('shutdown', bus.stop)
+
     if spec.model_directory:
         md_path = os.path.join(spec_dir, spec.model_directory)
         if os.path.exists(md_path):
@@ -192,6 +237,15 @@ async def load_app(path: str) -> fastapi.FastAPI:
         dbconf = state.APP_STATE[app]['databases'][d.name]
         if d.auto_initialize:
             dbconf['metadata'].create_all(dbconf['engine'])
+        if dbconf['db'] is not None:
+            app.add_event_handler('startup', dbconf['db'].connect)
+            app.add_event_handler('shutdown', dbconf['db'].disconnect)
+        app.add_event_handler('shutdown', dbconf['executor'].shutdown)
+
+    # after the databases are connected
+    for name, model_spec in state.APP_STATE[app].get('models', {}).items():
+        if model_spec.referenceData:
+            app.add_event_handler('startup', functools.partial(load_reference_data, app, name))
 
     env_settings = Settings()
     oidc_discovery_endpoint = spec.oidc_discovery_endpoint or env_settings.OIDC_DISCOVERY_ENDPOINT
@@ -210,6 +264,15 @@ async def load_app(path: str) -> fastapi.FastAPI:
 
     return app
 
+async def load_reference_data(app: App, name: str):
+    col: BaseCollection = app.collection[name](internal_request(app, name))
+    await col._reference_table(secure=False)
+
+def apply_invalidation(app: App, message: dict):
+    col = state.APP_STATE[app].get('model_collections', {}).get(message['model'], None)
+    if col is not None:
+        col.invalidate_local(message['field'], message['values'])
+
 def db_upgrade(app: App):
     for m in state.APP_STATE[app]['databases'].values():
         metadata = m['metadata']
@@ -238,6 +301,7 @@ def load_app_models(app: App, directory_path):
         state.APP_STATE[app].setdefault('model_collections', {})
         state.APP_STATE[app]['model_collections'][spec.name] = res['collection']
 
+    app_spec: schema.AppSpec = state.APP_STATE[app]['settings']
     for name, col in state.APP_STATE[app]['model_collections'].items():
         spec = state.APP_STATE[app]['models'][name]
         register_collection(app, col, 
@@ -248,6 +312,8 @@ def load_app_models(app: App, directory_path):
             delete_enabled=spec.views.delete.enabled,
             openapi_extra=openapi_extra,
             max_page_size=spec.views.listing.maxPageSize,
+            count_mode=spec.views.listing.countMode,
+            fast_serialization=app_spec.fast_serialization,
         )
 
 def load_model_spec(app: App, spec: schema.ModelSpec):
@@ -264,6 +330,7 @@ def load_model_spec(app: App, spec: schema.ModelSpec):
             spec, Schema, table, 
             name=snake_to_pascal(spec.name))
         result['collection'] = Collection
+        Collection.permissionFilterClauses = compile_permission_filters(spec.permissionFilters)
     else:
         raise exc.AurelixException("Unknown model type %s" % model_type)
     
@@ -274,6 +341,9 @@ def load_model_spec(app: App, spec: schema.ModelSpec):
         impl = load_multi_code_ref(spec.validators)
         validators['model'] = impl
     for field_name, field in spec.fields.items():
+        if field.deferred and field.dataType.type not in DEFERRABLE_TYPES:
+            raise exc.AurelixException("Field %s of %s can't be deferred, only %s fields can" % (
+                field_name, spec.name, ', '.join(DEFERRABLE_TYPES)))
         if field.validators:
             impl = load_multi_code_ref(field.validators)
             validators['fields'][field_name] = impl
@@ -336,40 +406,76 @@ def generate_statemachine(spec: schema.ModelSpec, name: str = 'StateMachine'):
                     attrs[m + '_' + s.value] = impl
     return type(name, (StateMachine, ), attrs)
 
-def load_multi_code_ref(coderefs: list[schema.CodeRefSpec] | schema.CodeRefSpec, package=None):
+async def call_code_ref(impl, *args, **kwargs):
+    result = impl(*args, **kwargs)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+def batch_result(values) -> list:
+    # batch transformers may return numpy arrays
+    if hasattr(values, 'tolist'):
+        return values.tolist()
+    return list(values)
+
+def load_code_refs(coderefs: list[schema.CodeRefSpec] | schema.CodeRefSpec, package=None) -> list[tuple[typing.Callable, bool]]:
     impls = []
     if type(coderefs) != list:
         coderefs = [coderefs]
     for coderef in coderefs:
         impl = load_code_ref(coderef, package)
         if impl:
-            impls.append(impl)
+            impls.append((impl, coderef.batch))
+    return impls
+
+# Chains of functions are wrapped into a per item callable, with the batch
+# form of the chain as its `batch` attribute. Batch functions are called 
+# with single item lists for one item, and per item functions are called 
+# for every item of a batch.
+
+def load_multi_code_ref(coderefs: list[schema.CodeRefSpec] | schema.CodeRefSpec, package=None):
+    impls = load_code_refs(coderefs, package)
     if impls:
-        async def wrapper(*args, **kwargs):
-            for i in impls:
-                if inspect.iscoroutinefunction(impl):
-                    await impl(*args, **kwargs) # type: ignore 
+        async def wrapper(self, *args, **kwargs):
+            for impl, batch in impls:
+                if batch:
+                    await call_code_ref(impl, self, *[[a] for a in args], **kwargs)
+                else:
+                    await call_code_ref(impl, self, *args, **kwargs)
+
+        async def batch_wrapper(self, *args: list):
+            for impl, batch in impls:
+                if batch:
+                    await call_code_ref(impl, self, *args)
                 else:
-                    impl(*args, **kwargs)
+                    for a in zip(*args):
+                        await call_code_ref(impl, self, *a)
+
+        wrapper.batch = batch_wrapper
         return wrapper
     return None
 
 def load_transform_code_ref(coderefs: list[schema.CodeRefSpec] | schema.CodeRefSpec, package=None):
-    impls = []
-    if type(coderefs) != list:
-        coderefs = [coderefs]
-    for coderef in coderefs:
-        impl = load_code_ref(coderef, package)
-        if impl:
-            impls.append(impl)
+    impls = load_code_refs(coderefs, package)
     if impls:
         async def wrapper(self, obj: dict, *args, **kwargs) -> dict:
-            for i in impls:
-                if inspect.iscoroutinefunction(impl):
-                    obj = await impl(self, obj, *args, **kwargs) # type: ignore 
+            for impl, batch in impls:
+                if batch:
+                    result = await call_code_ref(impl, self, [obj], *[[a] for a in args], **kwargs)
+                    obj = batch_result(result)[0]
                 else:
-                    obj = impl(self, obj, *args, **kwargs)
+                    obj = await call_code_ref(impl, self, obj, *args, **kwargs)
             return obj
+
+        async def batch_wrapper(self, objs: list, *args: list) -> list:
+            for impl, batch in impls:
+                if batch:
+                    objs = batch_result(await call_code_ref(impl, self, objs, *args))
+                else:
+                    objs = [await call_code_ref(impl, self, *a) for a in zip(objs, *args)]
+            return objs
+
+        wrapper.batch = batch_wrapper
         return wrapper
     return None
 
@@ -403,22 +509,44 @@ def generate_sqlalchemy_collection(app: App,
 
     database = state.APP_STATE[app]['databases'][spec.storageType.database]['db']
     engine = state.APP_STATE[app]['databases'][spec.storageType.database]['engine']
+    executor = state.APP_STATE[app]['databases'][spec.storageType.database]['executor']
+    app_spec: schema.AppSpec = state.APP_STATE[app]['settings']
     if spec.storageType.name == 'sqlalchemy-sync':
         BaseClass = SQLACollection
-        def constructor(self, request):
-            SQLACollection.__init__(self, request, engine=engine, table=table)
+        base_init = SQLACollection.__init__
+        init_kwargs = {'engine': engine, 'table': table, 'executor': executor}
     elif spec.storageType.name == 'sqlalchemy':
         BaseClass = AsyncSQLACollection
-        def constructor(self, request):
-            AsyncSQLACollection.__init__(self, request, database=database, table=table)
+        base_init = AsyncSQLACollection.__init__
+        init_kwargs = {'database': database, 'table': table}
+
+    attrs = {}
+    if app_spec.production_mode:
+        # arguments were already validated at the view, skip revalidating 
+        # them on every internal collection call
+        attrs.update(unvalidated_methods(BaseClass))
+        base_init = getattr(base_init, 'raw_function', base_init)
 
-    attrs = {
+    def constructor(self, request):
+        base_init(self, request, **init_kwargs)
+
+    attrs.update({
         'name': spec.name,
         'Schema': schema,
         'permissionFilters': spec.permissionFilters,
         'defaultFieldPermission': spec.defaultFieldPermission,
+        'supportsReturning': dialect_supports_returning(engine.dialect),
+        'supportsWindowFunctions': dialect_supports_window_functions(engine.dialect),
+        'supportsCountEstimate': engine.dialect.name == 'postgresql',
+        'nullsSortHigh': dialect_sorts_nulls_high(engine.dialect),
+        'fieldDecoders': generate_field_decoders(spec, schema),
+        'deferredFields': [k for k, f in spec.fields.items() if f.deferred],
+        'rowCache': row_cache(spec.cache),
+        'referenceTable': reference_table(spec),
+        'invalidationBus': state.APP_STATE[app].get('invalidation_bus', None),
+        'listingCache': response_cache(spec.views.listing.cache),
         '__init__': constructor       
-    }
+    })
     for m in ['before_create', 'after_create', 
               'before_update', 'after_update', 
               'before_delete', 'after_delete']:
@@ -465,6 +593,18 @@ def generate_pydantic_model(spec: schema.ModelSpec, name: str = 'Schema'):
         **fields
     )
 
+def generate_field_decoders(spec: schema.ModelSpec, Schema: type[pydantic.BaseModel]) -> dict[str, typing.Callable]:
+    # the sqlalchemy column types already return values as PY_TYPES,
+    # except for enum fields which are stored as plain strings
+    decoders = {}
+    for field_name, field_spec in spec.fields.items():
+        if field_spec.dataType.enum:
+            annotation = Schema.model_fields[field_name].annotation
+            enum_types = [t for t in (typing.get_args(annotation) or [annotation]) 
+                          if isinstance(t, type) and issubclass(t, enum.Enum)]
+            decoders[field_name] = enum_types[0]
+    return decoders
+
 @validate_types
 def generate_sqlalchemy_table(app, spec: schema.ModelSpec) -> sa.Table:
     metadata = state.APP_STATE[app]['databases'][spec.storageType.database]['metadata']
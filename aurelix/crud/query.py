@@ -0,0 +1,306 @@
+import re
+import datetime
+import enum
+import functools
+import operator
+import typing
+import pydantic
+import sqlalchemy as sa
+from .. import exc
+
+# Listing query language
+#
+#   title = 'hello' and (count >= 10 or status in ('new', 'running'))
+#   not name like 'foo%' and dateModified > '2023-01-01T00:00:00'
+#   owner is not null
+#
+# Queries are parsed into a small tree of tuples and compiled into
+# sqlalchemy expressions against the table columns with every value
+# as a bound parameter.
+
+TOKEN_RE = re.compile(r'''\s*(?:
+    (?P<string>'(?:[^']|'')*')|
+    (?P<number>-?\d+(?:\.\d+)?(?![A-Za-z_]))|
+    (?P<op><=|>=|!=|<>|=|<|>)|
+    (?P<lparen>\()|
+    (?P<rparen>\))|
+    (?P<comma>,)|
+    (?P<name>[A-Za-z_][A-Za-z0-9_]*)|
+    (?P<quoted_name>"[^"]+")
+)''', re.VERBOSE)
+
+KEYWORDS = ('and', 'or', 'not', 'in', 'like', 'ilike', 'is', 'null', 'true', 'false')
+
+OPERATORS = {
+    '=': lambda c, v: c == v,
+    '!=': lambda c, v: c != v,
+    '<>': lambda c, v: c != v,
+    '<': lambda c, v: c < v,
+    '<=': lambda c, v: c <= v,
+    '>': lambda c, v: c > v,
+    '>=': lambda c, v: c >= v,
+    'like': lambda c, v: c.like(v),
+    'not like': lambda c, v: c.not_like(v),
+    'ilike': lambda c, v: c.ilike(v),
+    'not ilike': lambda c, v: c.not_ilike(v),
+    'in': lambda c, v: c.in_(v),
+    'not in': lambda c, v: c.not_in(v),
+    'is': lambda c, v: c.is_(None),
+    'is not': lambda c, v: c.is_not(None),
+}
+
+def tokenize(query: str) -> list[tuple[str, typing.Any]]:
+    tokens = []
+    pos = 0
+    query = query.rstrip()
+    while pos < len(query):
+        m = TOKEN_RE.match(query, pos)
+        if not m or m.end() == pos:
+            raise exc.SearchException("Invalid query syntax near '%s'" % query[pos:].strip()[:20])
+        pos = m.end()
+        kind = m.lastgroup
+        text = m.group(kind)
+        if kind == 'string':
+            tokens.append(('value', text[1:-1].replace("''", "'")))
+        elif kind == 'number':
+            tokens.append(('value', float(text) if '.' in text else int(text)))
+        elif kind == 'quoted_name':
+            tokens.append(('name', text[1:-1]))
+        elif kind == 'name' and text.lower() in KEYWORDS:
+            keyword = text.lower()
+            if keyword in ('true', 'false'):
+                tokens.append(('value', keyword == 'true'))
+            elif keyword == 'null':
+                tokens.append(('value', None))
+            else:
+                tokens.append(('keyword', keyword))
+        else:
+            tokens.append((kind, text))
+    return tokens
+
+class Parser(object):
+
+    def __init__(self, tokens: list[tuple[str, typing.Any]]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self, kind: str, value=None) -> bool:
+        if self.pos >= len(self.tokens):
+            return False
+        k, v = self.tokens[self.pos]
+        return k == kind and (value is None or v == value)
+
+    def take(self, kind: str, value=None):
+        if not self.peek(kind, value):
+            if self.pos >= len(self.tokens):
+                raise exc.SearchException("Unexpected end of query")
+            raise exc.SearchException("Unexpected '%s' in query" % (self.tokens[self.pos][1],))
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token[1]
+
+    def parse(self):
+        node = self.parse_or()
+        if self.pos < len(self.tokens):
+            raise exc.SearchException("Unexpected '%s' in query" % (self.tokens[self.pos][1],))
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek('keyword', 'or'):
+            self.take('keyword')
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', tuple(nodes))
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek('keyword', 'and'):
+            self.take('keyword')
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ('and', tuple(nodes))
+
+    def parse_not(self):
+        if self.peek('keyword', 'not'):
+            self.take('keyword')
+            return ('not', self.parse_not())
+        if self.peek('lparen'):
+            self.take('lparen')
+            node = self.parse_or()
+            self.take('rparen')
+            return node
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        field = self.take('name')
+        if self.peek('op'):
+            op = self.take('op')
+            value = self.take('value')
+            if value is None:
+                # '= null' is treated as 'is null'
+                if op == '=':
+                    return ('compare', field, 'is', None)
+                if op in ('!=', '<>'):
+                    return ('compare', field, 'is not', None)
+                raise exc.SearchException("Invalid comparison with null on field '%s'" % field)
+            return ('compare', field, op, value)
+        if self.peek('keyword', 'is'):
+            self.take('keyword')
+            op = 'is'
+            if self.peek('keyword', 'not'):
+                self.take('keyword')
+                op = 'is not'
+            if not (self.peek('value') and self.tokens[self.pos][1] is None):
+                raise exc.SearchException("Expected null after 'is' on field '%s'" % field)
+            self.take('value')
+            return ('compare', field, op, None)
+        negate = False
+        if self.peek('keyword', 'not'):
+            self.take('keyword')
+            negate = True
+        if self.peek('keyword', 'in'):
+            self.take('keyword')
+            self.take('lparen')
+            values = [self.take('value')]
+            while self.peek('comma'):
+                self.take('comma')
+                values.append(self.take('value'))
+            self.take('rparen')
+            return ('compare', field, 'not in' if negate else 'in', tuple(values))
+        for op in ('like', 'ilike'):
+            if self.peek('keyword', op):
+                self.take('keyword')
+                value = self.take('value')
+                if not isinstance(value, str):
+                    raise exc.SearchException("Expected string pattern for '%s' on field '%s'" % (op, field))
+                return ('compare', field, 'not ' + op if negate else op, value)
+        if self.pos >= len(self.tokens):
+            raise exc.SearchException("Unexpected end of query")
+        raise exc.SearchException("Unexpected '%s' in query" % (self.tokens[self.pos][1],))
+
+@functools.lru_cache(maxsize=1024)
+def parse_query(query: str):
+    return Parser(tokenize(query)).parse()
+
+def compile_query(query: str, table: sa.Table, Schema: type[pydantic.BaseModel],
+                  restricted_fields: list[str] | None = None):
+    return compile_node(parse_query(query), table, Schema, restricted_fields or [])
+
+@functools.lru_cache(maxsize=4096)
+def field_adapter(Schema: type[pydantic.BaseModel], field: str) -> pydantic.TypeAdapter:
+    # building an adapter compiles a validation schema, done once per field
+    return pydantic.TypeAdapter(Schema.model_fields[field].annotation)
+
+def _coerce(Schema: type[pydantic.BaseModel], field: str, value):
+    try:
+        return field_adapter(Schema, field).validate_python(value)
+    except pydantic.ValidationError:
+        raise exc.SearchException("Invalid value %r for field '%s'" % (value, field))
+
+def compile_node(node, table: sa.Table, Schema: type[pydantic.BaseModel], restricted_fields: list[str]):
+    kind = node[0]
+    if kind == 'and':
+        return sa.and_(*[compile_node(n, table, Schema, restricted_fields) for n in node[1]])
+    if kind == 'or':
+        return sa.or_(*[compile_node(n, table, Schema, restricted_fields) for n in node[1]])
+    if kind == 'not':
+        return sa.not_(compile_node(node[1], table, Schema, restricted_fields))
+
+    _, field, op, value = node
+    column = getattr(table.c, field, None)
+    if column is None or field not in Schema.model_fields or field in restricted_fields:
+        raise exc.SearchException("Invalid query field '%s'" % field)
+    if op in ('in', 'not in'):
+        value = [_coerce(Schema, field, v) for v in value]
+    elif op not in ('like', 'not like', 'ilike', 'not ilike', 'is', 'is not'):
+        value = _coerce(Schema, field, value)
+    return OPERATORS[op](column, value)
+
+# Queries are also evaluated against rows held in memory for reference data
+# models, with the null semantics of sql. Comparisons whose result depends on
+# the database (like patterns, any comparison of text, which follows the 
+# collation of the column) are left to the database.
+
+class UnsupportedQuery(Exception):
+    pass
+
+MATCH_OPERATORS = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda v, values: v in values,
+    'not in': lambda v, values: v not in values,
+}
+
+def match_query(query: str, Schema: type[pydantic.BaseModel],
+                restricted_fields: list[str] | None = None) -> typing.Callable[[dict], bool] | None:
+    # row predicate, None when the query has to run on the database
+    try:
+        match = match_node(parse_query(query), Schema, restricted_fields or [])
+    except UnsupportedQuery:
+        return None
+    return lambda row: match(row) is True
+
+def _match_all(results: typing.Iterable[bool | None]) -> bool | None:
+    unknown = False
+    for r in results:
+        if r is False:
+            return False
+        if r is None:
+            unknown = True
+    return None if unknown else True
+
+def _match_any(results: typing.Iterable[bool | None]) -> bool | None:
+    unknown = False
+    for r in results:
+        if r is True:
+            return True
+        if r is None:
+            unknown = True
+    return None if unknown else False
+
+def match_node(node, Schema: type[pydantic.BaseModel], restricted_fields: list[str]):
+    kind = node[0]
+    if kind in ('and', 'or'):
+        matches = [match_node(n, Schema, restricted_fields) for n in node[1]]
+        combine = _match_all if kind == 'and' else _match_any
+        return lambda row: combine(m(row) for m in matches)
+    if kind == 'not':
+        match = match_node(node[1], Schema, restricted_fields)
+        def match_not(row):
+            result = match(row)
+            return None if result is None else not result
+        return match_not
+    _, field, op, value = node
+    if field not in Schema.model_fields or field in restricted_fields:
+        raise exc.SearchException("Invalid query field '%s'" % field)
+    if op == 'is':
+        return lambda row: row[field] is None
+    if op == 'is not':
+        return lambda row: row[field] is not None
+    if op not in MATCH_OPERATORS:
+        raise UnsupportedQuery(op)
+    if op in ('in', 'not in'):
+        value = tuple(_coerce(Schema, field, v) for v in value)
+        values = value
+    else:
+        value = _coerce(Schema, field, value)
+        values = (value,)
+    for v in values:
+        if v is None or isinstance(v, (dict, list)):
+            raise UnsupportedQuery(op)
+        if isinstance(v, datetime.datetime) and v.tzinfo is not None:
+            raise UnsupportedQuery(op)
+        # enum values are stored as given
+        if isinstance(v, str) and not isinstance(v, enum.Enum):
+            raise UnsupportedQuery(op)
+    compare = MATCH_OPERATORS[op]
+    def match_compare(row):
+        v = row[field]
+        if v is None:
+            return None
+        return compare(v, value)
+    return match_compare
@@ -0,0 +1,56 @@
+import typing
+from .. import schema
+
+# Whole table of a reference data model (countries, categories, status codes)
+# held in memory. Rows are loaded on startup and again on the first read after
+# a write, lookups go through per field indexes built on first use.
+
+class ReferenceTable(object):
+
+    def __init__(self):
+        self.rows: list[dict] | None = None
+        self.indexes: dict[str, dict[typing.Any, list[dict]]] = {}
+        # bumped on every write, a load which started before a write must
+        # not keep the rows it got
+        self.version = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.rows is not None
+
+    def load(self, rows: list[dict], version: int):
+        if version != self.version:
+            return
+        self.rows = rows
+        self.indexes = {}
+
+    def index(self, field: str) -> dict[typing.Any, list[dict]]:
+        if field not in self.indexes:
+            index = {}
+            for row in self.rows:
+                index.setdefault(row[field], []).append(row)
+            self.indexes[field] = index
+        return self.indexes[field]
+
+    def find(self, field: str, values: list) -> list[dict]:
+        index = self.index(field)
+        result = []
+        for value in values:
+            result += index.get(value, [])
+        return result
+
+    def invalidate(self):
+        self.version += 1
+        self.rows = None
+        self.indexes = {}
+
+def reference_table(spec: schema.ModelSpec) -> ReferenceTable | None:
+    if not spec.referenceData:
+        return None
+    return ReferenceTable()
+
+def sort_rows(rows: list[dict], order_by: list[tuple[str, str]]) -> list[dict]:
+    # stable sorts from the last key to the first
+    for field, direction in reversed(order_by):
+        rows = sorted(rows, key=lambda r: r[field], reverse=direction.lower() == 'desc')
+    return rows
@@ -1,24 +1,37 @@
-from fastapi import FastAPI, Request, HTTPException, Body, UploadFile
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, Request, Response, HTTPException, Body, UploadFile
+from fastapi.responses import RedirectResponse, JSONResponse, StreamingResponse
 from fastapi.exceptions import ValidationException
 import json
 import pydantic
 import typing
 import math
+import functools
 import enum
+import urllib.parse
 from .. import schema
 from .. import exc
 from .base import BaseCollection
 from fastapi.responses import RedirectResponse
-from ..dependencies import Token
-from .dependencies import Model
-from ..utils import snake_to_pascal, snake_to_human, item_json
+from ..dependencies import Token, get_permission_identities
+from .dependencies import Model, load_model
+from ..utils import snake_to_pascal, snake_to_human, item_json, items_json, encode_cursor, dump_json
+from ..utils import items_etag, etag_matches, get_relation_loader
 from .. import state
+from .export import export_response, stream_response, negotiate_format, MEDIA_TYPES
 
 class RelationshipMeta(pydantic.BaseModel):
     identifier: str 
     collection: str
 
+@functools.cache
+def generate_attributes_model(Schema: type[pydantic.BaseModel]):
+    # sparse fieldsets, deferred fields and field permissions leave out 
+    # attributes, including required ones
+    return pydantic.create_model(
+        Schema.__name__ + 'Attributes',
+        **dict([(k,(v.annotation | None, None)) for k,v in Schema.model_fields.items()])
+    )
+
 def generate_relationship_model(name, app, collection_name):
     spec: schema.ModelSpec = state.APP_STATE[app]['models'][collection_name]
     attrs = {}
@@ -26,7 +39,7 @@ def generate_relationship_model(name, app, collection_name):
         if field.relation:
             col: BaseCollection = state.APP_STATE[app]['model_collections'][field.relation.model]
             Schema = pydantic.create_model(snake_to_pascal(field.relation.model) + 'Links',
-                data = (col.Schema, None),
+                data = (generate_attributes_model(col.Schema), None),
                 links = (schema.ModelResultLinks, None),
                 meta = (RelationshipMeta, None)
             )
@@ -35,10 +48,66 @@ def generate_relationship_model(name, app, collection_name):
         return None
     return pydantic.create_model(name, **attrs)
 
+class FastJSONResponse(JSONResponse):
+    # encodes the view result as is, fastapi skips validating Response 
+    # objects against the response model
+    def render(self, content: typing.Any) -> bytes:
+        return dump_json(content)
+
+def _exclude_none(data: dict | None) -> dict | None:
+    if data is None:
+        return None
+    return dict((k, v) for k, v in data.items() if v is not None)
+
+def exclude_none_item(item: dict) -> dict:
+    # same as response_model_exclude_none, which only applies to model 
+    # fields and keeps null values inside json fields
+    result = _exclude_none(item)
+    for k in ('attributes', 'links'):
+        if k in result:
+            result[k] = _exclude_none(result[k])
+    if 'relationships' in result:
+        result['relationships'] = dict(
+            (name, dict((k, _exclude_none(v)) for k, v in rel.items() if v is not None))
+            for name, rel in result['relationships'].items()
+        )
+    return result
+
+def exclude_none_result(result: dict) -> dict:
+    result = _exclude_none(result)
+    data = result.get('data', None)
+    if isinstance(data, list):
+        result['data'] = [exclude_none_item(i) for i in data]
+    elif data is not None:
+        result['data'] = exclude_none_item(data)
+    for k in ('links', 'meta'):
+        if k in result:
+            result[k] = _exclude_none(result[k])
+    return result
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    if fields is None:
+        return None
+    return [f for f in fields.strip().replace(',',' ').split(' ') if f]
+
+def parse_ids(ids: str) -> list[str]:
+    return [i.strip() for i in ids.split(',') if i.strip()]
+
+def parse_order_by(order_by: str | None) -> list[list[str]]:
+    if order_by:
+        order_by = [(o.split(':') + ['asc'])[:2] for o in order_by.strip().replace(',',' ').split(' ')]
+    else:
+        order_by = []
+    # id as tie breaker, keeps pages stable and makes the cursor unique
+    if 'id' not in [o[0] for o in order_by]:
+        order_by.append(['id', 'asc'])
+    return order_by
+
 def register_collection(app, Collection: type[BaseCollection], create_enabled=True, read_enabled=True, 
                         update_enabled=True, delete_enabled=True, listing_enabled=True, upload_enabled=True,
                         download_enabled=True,
-                        openapi_extra=None, max_page_size=100):
+                        openapi_extra=None, max_page_size=100, count_mode=schema.CountMode.exact,
+                        fast_serialization=False):
 
     openapi_extra = openapi_extra or {}
     collection_name = Collection.name
@@ -50,7 +119,7 @@ def register_collection(app, Collection: type[BaseCollection], create_enabled=Tr
     model_attrs = {
         'type': (str, None),
         'id': (int, None),
-        'attributes': (Schema, None),
+        'attributes': (generate_attributes_model(Schema), None),
         'links': (typing.Optional[schema.ModelResultLinks], None)
     }
 
@@ -74,6 +143,11 @@ def register_collection(app, Collection: type[BaseCollection], create_enabled=Tr
         data = (ModelData, None),
     )
 
+    ModelBulkResult = pydantic.create_model(
+        snake_to_pascal(collection_name) + 'ModelBulkResult', 
+        data = (typing.List[ModelData], None),
+    )
+
     ModelInput = pydantic.create_model(
         Schema.__name__ + 'Input',
         **dict([(k,(v.annotation, v.default)) for k,v in Schema.model_fields.items() if k not in Model.model_fields.keys()])
@@ -84,33 +158,138 @@ def register_collection(app, Collection: type[BaseCollection], create_enabled=Tr
          **dict([(k,(v.annotation | None, v.default)) for k,v in Schema.model_fields.items() if k not in Model.model_fields.keys()])       
     )
 
+    def respond(result: dict, exclude_none: bool = True, response: Response | None = None, 
+                headers: dict[str, str] | None = None):
+        # fastapi validates returned dicts against the declared response model,
+        # which stays in place for the openapi schema either way. Responses 
+        # keeping null fields go through it too, as it fills in the fields 
+        # left out of relationship data
+        if not fast_serialization or not exclude_none:
+            if headers:
+                response.headers.update(headers)
+            return result
+        return FastJSONResponse(exclude_none_result(result), headers=headers)
+
+    def not_modified(etag: str):
+        return Response(status_code=304, headers={'ETag': etag})
+
+    listing_cache = Collection.listingCache
+
+    async def listing_cache_key(col: BaseCollection, fields: list[str] | None, *params) -> tuple:
+        # the page shows rows of the collection and of its related collections, 
+        # responses are shared by callers with the same identities, as output
+        # transformers may depend on them, and dropped when any of the 
+        # collections is written
+        loader = get_relation_loader(col.request)
+        identities = await get_permission_identities(col.request)
+        key = [col.url(), tuple(fields) if fields is not None else None, params, tuple(sorted(identities)),
+               col.dataVersion, await col.visibility_key()]
+        for field_name, field in col.spec.fields.items():
+            if not field.relation or (fields is not None and field_name not in fields):
+                continue
+            field_col = await loader.get_collection(field.relation.model)
+            key += [field.relation.model, field_col.dataVersion, await field_col.visibility_key()]
+        return tuple(key)
+
+    def cached_listing(request: Request, response: Response, etag: str, result: dict, body: bytes | None):
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        if body is not None:
+            return Response(body, media_type='application/json', headers={'ETag': etag})
+        response.headers['ETag'] = etag
+        return result
+
+    # listing pages and exports can also be requested as any export format 
+    # through the Accept header
+    export_responses = {200: {'content': dict((m, {}) for m in MEDIA_TYPES.values())}}
+
     if listing_enabled:
         @Collection.view('/', method='GET', openapi_extra=openapi_extra, 
                          summary='List %s' % snake_to_human(collection_name),
-                         response_model_exclude_none=True)
-        async def listing(request: Request, token: Token, query: str | None = None, 
-                          page: int = 0, page_size: int = 10, order_by: str | None = None) -> ModelSearchResult:
+                         response_model_exclude_none=True,
+                         responses=export_responses)
+        async def listing(request: Request, response: Response, token: Token, query: str | None = None, 
+                          page: int = 0, page_size: int = 10, order_by: str | None = None,
+                          cursor: str | None = None, fields: str | None = None) -> ModelSearchResult:
             if page_size > max_page_size:
                 page_size = 100
             if page_size < 1:
                 page_size = 1
             col = Collection(request)
-            if order_by:
-                order_by = [o.split(':') for o in order_by.strip().replace(',',' ').split(' ')]
-            total = await col.count(query=query)
-            items = await col.search(query=query, offset=page * page_size, limit=page_size, order_by=order_by)
+            query = query.strip() if query else None
+            requested_fields = parse_fields(fields)
+            fields = requested_fields
+            if fields is None:
+                fields = col.listing_fields()
+            order_by = parse_order_by(order_by)
+            format = negotiate_format(request)
+            # normalized request, the cache key, the etag and the links are 
+            # all derived from it so equivalent urls get the same response
+            request_key = (query, page, page_size, tuple(tuple(o) for o in order_by), cursor, 
+                      tuple(requested_fields) if requested_fields is not None else None)
+            cache_key = None
+            if listing_cache is not None and format is None:
+                cache_key = await listing_cache_key(col, fields, *request_key)
+                cached = listing_cache.get(cache_key)
+                if cached is not None:
+                    return cached_listing(request, response, *cached)
+            total = None
+            if cursor:
+                # keyset pages start after the cursor, the total is left out
+                # as counting the result set on every page would make walking
+                # the collection quadratic
+                items = await col.search(query=query, limit=page_size + 1, order_by=order_by, cursor=cursor, 
+                                         fields=fields)
+                has_next = len(items) > page_size
+                items = items[:page_size]
+            elif count_mode == schema.CountMode.exact:
+                items, total = await col.search_with_total(query=query, offset=page * page_size, limit=page_size, 
+                                                           order_by=order_by, fields=fields)
+                has_next = (total - (page*page_size)) > page_size
+            else:
+                # fetch one extra item to find out whether there is a next page
+                items = await col.search(query=query, offset=page * page_size, limit=page_size + 1, 
+                                         order_by=order_by, fields=fields)
+                has_next = len(items) > page_size
+                items = items[:page_size]
+                if count_mode == schema.CountMode.estimate:
+                    total = await col.estimate_count(query=query)
             endpoint_url = col.url()
+
+            def page_url(**params):
+                params.update({'page_size': page_size, 'query': query, 
+                               'order_by': ','.join('%s:%s' % (c, d) for c, d in order_by),
+                               'fields': ','.join(requested_fields) if requested_fields is not None else None})
+                params = dict((k, v) for k, v in params.items() if v is not None)
+                return endpoint_url + '?' + urllib.parse.urlencode(params)
+
             next = None
-            if (total - (page*page_size)) > page_size:
-                next = endpoint_url + '?page=%s&page_size=%s' % (page + 1, page_size)
+            if has_next and items:
+                next = page_url(page=page + 1, cursor=encode_cursor(order_by, items[-1]))
             if page <= 0:
                 prev = None
             else:
-                prev = endpoint_url + '?page=%s&page_size=%s' % (page - 1, page_size)
-            self_url = endpoint_url + '?page=%s&page_size=%s' % (page, page_size)
-            total_pages = int(math.ceil(float(total) / page_size))
-            return {
-                'data': [await item_json(col, i) for i in items],
+                prev = page_url(page=page - 1)
+            self_url = page_url(page=page, cursor=cursor)
+            total_pages = None
+            if total is not None:
+                total_pages = int(math.ceil(float(total) / page_size))
+
+            # the page hash covers the items and their related objects, the 
+            # total and the links
+            etag = await items_etag(col, items, fields, *request_key, format, total, next, prev)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            if format is not None:
+                async def page_items():
+                    yield items
+                links = ['<%s>; rel="%s"' % (url, rel) for rel, url in [('next', next), ('prev', prev)] if url]
+                headers = {'ETag': etag}
+                if links:
+                    headers['Link'] = ', '.join(links)
+                return await stream_response(col, page_items(), fields, format, headers=headers)
+            result = {
+                'data': await items_json(col, items, fields=fields),
                 'links': {
                     'next': next,
                     'prev': prev,
@@ -122,6 +301,24 @@ def register_collection(app, Collection: type[BaseCollection], create_enabled=Tr
                     'total_pages': total_pages
                 }
             }
+            resp = respond(result, response=response, headers={'ETag': etag})
+            if cache_key is not None:
+                body = resp.body if isinstance(resp, Response) else None
+                listing_cache.set(cache_key, (etag, result, body))
+            return resp
+
+        @Collection.view('/+export', method='GET', openapi_extra=openapi_extra, 
+                         summary='Export %s' % snake_to_human(collection_name),
+                         response_class=StreamingResponse,
+                         responses=export_responses)
+        async def export(request: Request, token: Token, query: str | None = None, order_by: str | None = None,
+                         fields: str | None = None, format: schema.ExportFormat | None = None):
+            col = Collection(request)
+            fields = parse_fields(fields)
+            if fields is None:
+                fields = col.listing_fields()
+            format = negotiate_format(request, format) or schema.ExportFormat.ndjson
+            return await export_response(col, query, parse_order_by(order_by), fields, format)
 
     if create_enabled:
         @Collection.view('/', method='POST', openapi_extra=openapi_extra, summary='Create new %s' % snake_to_human(collection_name))
@@ -129,16 +326,50 @@ def register_collection(app, Collection: type[BaseCollection], create_enabled=Tr
                         response_model_exclude_none=True) -> ModelResult:
             col = Collection(request)
             item = await col.create(item)
-            return ModelResult.model_validate({'data': await item_json(col, item)})
+            return respond({'data': await item_json(col, item)}, exclude_none=False)
+
+        @Collection.view('/+bulk', method='POST', openapi_extra=openapi_extra, 
+                         summary='Create multiple %s' % snake_to_human(collection_name),
+                         response_model_exclude_none=True)
+        async def bulk_create(request: Request, token: Token, items: list[ModelInput]) -> ModelBulkResult:
+            col = Collection(request)
+            items = await col.bulk_create(items)
+            return respond({'data': await items_json(col, items)})
 
     if read_enabled:
+        async def batch_get_result(col: BaseCollection, ids: list[str | int], fields: list[str] | None):
+            # one IN query for the items, relationships of all of them are 
+            # loaded together
+            items = await col.get_many(ids, fields=fields)
+            return respond({'data': await items_json(col, items, fields=fields)})
+
+        @Collection.view('/+batch-get', method='GET', openapi_extra=openapi_extra, 
+                         summary='Get multiple %s' % snake_to_human(collection_name),
+                         response_model_exclude_none=True)
+        async def batch_get(request: Request, token: Token, ids: str, fields: str | None = None) -> ModelBulkResult:
+            col = Collection(request)
+            return await batch_get_result(col, parse_ids(ids), parse_fields(fields))
+
+        @Collection.view('/+batch-get', method='POST', openapi_extra=openapi_extra, 
+                         summary='Get multiple %s' % snake_to_human(collection_name),
+                         response_model_exclude_none=True)
+        async def batch_get_post(request: Request, token: Token, batch: schema.BatchGetRequest) -> ModelBulkResult:
+            col = Collection(request)
+            return await batch_get_result(col, batch.ids, batch.fields)
+
         @Collection.view('/{identifier}', method='GET', openapi_extra=openapi_extra, 
                          summary='Get %s' % snake_to_human(collection_name),
                          response_model_exclude_none=True)
-        async def read(request: Request, token: Token, col: Collection, model: Model, identifier: str) -> ModelResult:
-            return ModelResult.model_validate({
-                'data': await item_json(col, model)
-            })
+        async def read(request: Request, response: Response, token: Token, col: Collection, identifier: str, 
+                       fields: str | None = None) -> ModelResult:
+            fields = parse_fields(fields)
+            model = await load_model(col, identifier, fields=fields)
+            etag = await items_etag(col, [model], fields, str(request.url))
+            if etag_matches(request, etag):
+                return not_modified(etag)
+            return respond({
+                'data': await item_json(col, model, fields=fields)
+            }, response=response, headers={'ETag': etag})
 
     if update_enabled:
 
@@ -156,14 +387,30 @@ def register_collection(app, Collection: type[BaseCollection], create_enabled=Tr
                 raise exc.ValidationError(e.errors())
             item = ModelPatchInput.model_validate(patch)
             item = await col.update(identifier, patch)
-            return ModelResult.model_validate({'data': await item_json(col, item)})
+            return respond({'data': await item_json(col, item)})
         
+        @Collection.view('/+bulk', method='PATCH', openapi_extra=openapi_extra, 
+                         summary='Update multiple %s' % snake_to_human(collection_name),
+                         response_model_exclude_none=True)
+        async def bulk_update(request: Request, token: Token, items: list[schema.BulkUpdateItem]) -> ModelBulkResult:
+            errors = []
+            for idx, i in enumerate(items):
+                try:
+                    ModelPatchInput.model_validate(i.data)
+                except pydantic.ValidationError as e:
+                    errors.append({'index': idx, 'detail': e.errors()})
+            if errors:
+                raise exc.ValidationError(errors)
+            col = Collection(request)
+            items = await col.bulk_update([(i.identifier, i.data) for i in items])
+            return respond({'data': await items_json(col, items)})
+
         @Collection.view('/{identifier}', method='PUT', openapi_extra=openapi_extra, 
                          summary='Update %s (Full)' % snake_to_human(collection_name),
                          response_model_exclude_none=True)
         async def update(request: Request, token: Token, identifier: str, col:Collection, item: ModelInput) -> ModelResult:
             item = await col.update(identifier, item)
-            return ModelResult.model_validate({'data': await item_json(col, item)})
+            return respond({'data': await item_json(col, item)})
 
     
     if delete_enabled:
@@ -175,6 +422,17 @@ def register_collection(app, Collection: type[BaseCollection], create_enabled=Tr
                     'detail': 'OK'
                 }
             raise HTTPException(status_code=422, detail='Not Deleted')
+
+        @Collection.view('/+bulk', method='DELETE', openapi_extra=openapi_extra, 
+                         summary='Delete multiple %s' % snake_to_human(collection_name))
+        async def bulk_delete(request: Request, token: Token, confirmation: schema.BulkDeleteConfirmation) -> schema.SimpleMessage:
+            if confirmation.delete:
+                col = Collection(request)
+                await col.bulk_delete(confirmation.identifiers)
+                return {
+                    'detail': 'OK'
+                }
+            raise HTTPException(status_code=422, detail='Not Deleted')
         
     if upload_enabled and Collection.objectStore:
         @Collection.view('/{identifier}/file/{field}/+upload-url', method='GET', openapi_extra=openapi_extra, 
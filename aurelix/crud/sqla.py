@@ -6,138 +6,540 @@ import pydantic
 import datetime
 import traceback
 from ..utils import validate_types
-from ..dependencies import get_permission_identities
+from ..dependencies import get_permission_identities, get_permission_parameters
 import dectate
 from transitions import Machine
 import typing
 from .. import schema
 from .. import exc
 import os
+import asyncio
+import functools
+import concurrent.futures
+import json
+import itertools
+from sqlalchemy.ext.compiler import compiles
 
 from .base import BaseCollection
+from .query import compile_query
 from ..exc import SearchException
 import sqlalchemy as sa
 
+PERMISSION_FILTER_PARAMETERS = ('sub', 'email', 'username', 'roles')
+
+def compile_where_filter(where_filter: str) -> sa.sql.expression.TextClause:
+    clause = sa.text(where_filter)
+    unknown = [k for k in clause._bindparams.keys() if k not in PERMISSION_FILTER_PARAMETERS]
+    if unknown:
+        raise exc.AurelixException("Unknown parameter '%s' in whereFilter '%s', valid parameters are %s" % (
+            unknown[0], where_filter, ', '.join(PERMISSION_FILTER_PARAMETERS)))
+    if 'roles' in clause._bindparams:
+        clause = clause.bindparams(sa.bindparam('roles', expanding=True))
+    return clause
+
+def compile_permission_filters(specs: list[schema.PermissionFilterSpec] | None) -> dict[str, sa.sql.expression.TextClause]:
+    result = {'1=0': sa.text('1=0')}
+    for f in (specs or []):
+        if f.whereFilter and f.whereFilter not in result:
+            result[f.whereFilter] = compile_where_filter(f.whereFilter)
+    return result
+
+def permission_clauses(compiled: dict[str, sa.sql.expression.TextClause], filters: list[str], params: dict) -> list:
+    # identity values are bound parameters, the statement structure (and its 
+    # compiled form in sqlalchemy cache) stays the same for every user
+    result = []
+    for f in filters:
+        clause = compiled.get(f, None)
+        if clause is None:
+            clause = compile_where_filter(f)
+        binds = dict((k, params[k]) for k in clause._bindparams.keys() if k in params)
+        if binds:
+            clause = clause.bindparams(**binds)
+        result.append(clause)
+    return result
+
+PERMITTED_COLUMN = '_permitted'
+
+def table_columns(table: sa.Table, fields: list[str] | None = None) -> list:
+    if fields is None:
+        return list(table.c)
+    return [table.c[f] for f in fields]
+
+def permission_columns(table: sa.Table, filters: list, fields: list[str] | None = None) -> list:
+    # permission filters are evaluated as a computed column instead of a
+    # where clause, so that a single statement can tell whether the row
+    # exists and whether it is visible
+    columns = table_columns(table, fields)
+    if filters:
+        columns.append(sa.case((sa.and_(*filters), sa.literal_column('1')), 
+                               else_=sa.literal_column('0')).label(PERMITTED_COLUMN))
+    return columns
+
+def row_permitted(row) -> bool:
+    if row is None:
+        return False
+    return bool(row._mapping.get(PERMITTED_COLUMN, 1))
+
+TOTAL_COLUMN = '_total'
+
+def row_data(row) -> dict:
+    data = dict(row._mapping)
+    data.pop(PERMITTED_COLUMN, None)
+    data.pop(TOTAL_COLUMN, None)
+    return data
+
+def row_total(row) -> int:
+    return row._mapping[TOTAL_COLUMN]
+
+# bound parameters per statement, below the limits of sqlite (32766) and asyncpg (32767)
+BULK_PARAMETER_LIMIT = 30000
+
+BULK_KEY = '_bulk_key'
+
+def bulk_batches(rows: list[dict]) -> typing.Iterator[list[dict]]:
+    # consecutive rows with the same columns, as a multi row statement
+    # takes the same columns from every row
+    for keys, group in itertools.groupby(rows, key=lambda r: tuple(r.keys())):
+        group = list(group)
+        size = max(1, BULK_PARAMETER_LIMIT // max(1, len(keys)))
+        for i in range(0, len(group), size):
+            yield group[i:i + size]
+
+def bulk_select_statements(table: sa.Table, filters: list, field: str, values: list, 
+                           lock: bool = False) -> typing.Iterator:
+    column = getattr(table.c, field)
+    for i in range(0, len(values), BULK_PARAMETER_LIMIT):
+        query = sa.select(permission_columns(table, filters)).where(column.in_(values[i:i + BULK_PARAMETER_LIMIT]))
+        if lock:
+            query = query.with_for_update()
+        yield query
+
+def bulk_ordered(items: list[dict], field: str, values: list, message: str) -> list[dict]:
+    # rows read back after a bulk write, in the order of the written 
+    # values. Every one of them has to exist and be visible.
+    found = dict((i[field], i) for i in items)
+    result = []
+    for v in values:
+        item = found.get(v, None)
+        if item is None or not item.pop(PERMITTED_COLUMN, 1):
+            raise exc.Forbidden(message)
+        result.append(item)
+    return result
+
+def bulk_update_params(updates: list[tuple[typing.Any, dict]]) -> list[dict]:
+    return [dict(data, **{BULK_KEY: value}) for value, data in updates]
+
+def keyset_after(column, value, desc: bool, nulls_high: bool):
+    # rows after value in the sort order of the column. NULL compares as the
+    # highest value on some databases (postgresql, oracle) and as the lowest 
+    # on others (sqlite, mysql, mssql)
+    nulls_last = nulls_high != desc
+    if value is None:
+        if nulls_last:
+            return sa.false()
+        return column.is_not(None)
+    cond = column < value if desc else column > value
+    if nulls_last and column.nullable:
+        cond = sa.or_(cond, column.is_(None))
+    return cond
+
+def keyset_equal(column, value):
+    if value is None:
+        return column.is_(None)
+    return column == value
+
+def keyset_filter(table: sa.Table, order_by: list[tuple[str,str]], values: list, nulls_high: bool = False):
+    # row comparison (c1, c2, ..) > (v1, v2, ..) expanded into OR terms to allow 
+    # mixed sort directions and NULL sort values
+    clauses = []
+    for idx, (c, d) in enumerate(order_by):
+        column = getattr(table.c, c, None)
+        if column is None:
+            raise exc.ValidationError("Invalid sort field '%s'" % c)
+        conds = [keyset_equal(getattr(table.c, pc), pv) for (pc, pd), pv in zip(order_by[:idx], values[:idx])]
+        conds.append(keyset_after(column, values[idx], d.lower() == 'desc', nulls_high))
+        clauses.append(sa.and_(*conds))
+    return sa.or_(*clauses)
+
+def search_statement(table: sa.Table, filters: list, offset: int = 0, limit: int | None = None, 
+                     order_by: list[tuple[str,str]] | None = None, with_total: bool = False,
+                     cursor_values: list | None = None, fields: list[str] | None = None,
+                     nulls_high: bool = False):
+    columns = table_columns(table, fields)
+    if with_total:
+        # total of the filtered set computed alongside the page rows
+        columns.append(sa.func.count().over().label(TOTAL_COLUMN))
+    db_query = sa.select(columns)
+    if cursor_values is not None:
+        filters = filters + [keyset_filter(table, order_by, cursor_values, nulls_high=nulls_high)]
+        offset = 0
+    if filters:
+        db_query = db_query.where(sa.and_(*filters))
+    db_query = db_query.limit(limit).offset(offset)
+    if order_by:
+        orderby = []
+        for c,d in order_by:
+            column = getattr(table.c, c, None)
+            if column is None:
+                raise exc.ValidationError("Invalid sort field '%s'" % c)
+            if d.lower() == 'desc':
+                orderby.append(column.desc())
+            elif d.lower() == 'asc':
+                orderby.append(column.asc())
+            else:
+                raise exc.ValidationError("Invalid sort direction '%s'" % d)
+        db_query = db_query.order_by(*orderby)
+    return db_query
+
+def count_statement(table: sa.Table, filters: list):
+    db_query = sa.select([sa.func.count()]).select_from(table)
+    if filters:
+        db_query = db_query.where(sa.and_(*filters))
+    return db_query
+
+class Explain(sa.sql.expression.Executable, sa.sql.expression.ClauseElement):
+    """EXPLAIN of a statement, compiled with the statement's own bound parameters"""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+@compiles(Explain, 'postgresql')
+def compile_explain(element: Explain, compiler, **kw):
+    return 'EXPLAIN (FORMAT JSON) %s' % compiler.process(element.statement, **kw)
+
+def estimate_statement(table: sa.Table, filters: list) -> Explain:
+    # postgresql only, uses the planner row estimate instead of scanning the filtered set
+    db_query = sa.select(list(table.c))
+    if filters:
+        db_query = db_query.where(sa.and_(*filters))
+    return Explain(db_query)
+
+def estimate_result(row) -> int:
+    plan = row[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
 class SQLACollection(BaseCollection):
 
+    permissionFilterClauses: dict[str, sa.sql.expression.TextClause] = {}
+    supportsReturning: bool = False
+    supportsWindowFunctions: bool = False
+    supportsCountEstimate: bool = False
+    nullsSortHigh: bool = False
+
     @validate_types
     def __init__(self, request: fastapi.Request, 
                  engine: sa.engine.Engine, 
-                 table: sa.Table):
+                 table: sa.Table,
+                 executor: concurrent.futures.Executor | None = None):
         self.path = '/' + self.name
         self.request = request
         self.table = table
         self._txn = None
         self.engine = engine
+        self.executor = executor
 
-    @validate_types
-    async def create(self, item: pydantic.BaseModel, secure=True, modify_object_store_fields=False, modify_workflow_status=False) -> pydantic.BaseModel:
-        data = await self.transform_create_data(item, secure=secure, modify_object_store_fields=modify_object_store_fields,
-                                                modify_workflow_status=modify_workflow_status)
-        await self.before_create(data)
+    async def run_sync(self, func, *args, **kwargs):
+        # blocking engine calls are sent to the database executor so that
+        # slow queries do not stall the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def _connection(self):
+        if self._txn:
+            return self._txn
+        return self.engine
+
+    def _fetchone(self, query):
+        res: sa.engine.CursorResult = self._connection().execute(query)
+        return res.fetchone()
+
+    def _fetchall(self, query):
+        res: sa.engine.CursorResult = self._connection().execute(query)
+        return res.fetchall()
+
+    def _execute(self, query):
+        self._connection().execute(query)
+
+    def _stream(self, query):
+        conn = self.engine.connect()
+        try:
+            result = conn.execution_options(stream_results=True).execute(query)
+        except Exception:
+            conn.close()
+            raise
+        return conn, result
+
+    def _insert_and_fetch(self, data: dict, filters: list):
         with self.engine.begin() as txn:
-            self._txn = txn
-            query = self.table.insert().values(**data)
-            result = txn.execute(query)
+            result = txn.execute(self.table.insert().values(**data))
             new_id = result.inserted_primary_key[0]
-            item = await self.get_by_id(new_id, secure=secure)
-            self._txn = None
+            filters = filters + [self.table.c.id==new_id]
+            item = txn.execute(self.table.select().where(sa.and_(*filters))).fetchone()
             if item is None:
                 raise exc.Forbidden("You are not allowed to create this object")
+        return item
+
+    def _insert_returning(self, data: dict, filters: list):
+        with self.engine.begin() as txn:
+            query = self.table.insert().values(**data).returning(*permission_columns(self.table, filters))
+            item = txn.execute(query).fetchone()
+            if not row_permitted(item):
+                raise exc.Forbidden("You are not allowed to create this object")
+        return item
+
+    def _update_returning(self, data: dict, filters: list, key):
+        with self.engine.begin() as txn:
+            query = (self.table.update().where(sa.and_(*(filters + [key]))).values(**data)
+                        .returning(*permission_columns(self.table, filters)))
+            item = txn.execute(query).fetchone()
+            if not row_permitted(item):
+                raise exc.Forbidden("You are not allowed to update this object")
+        return item
+
+    def _update_and_fetch(self, data: dict, filters: list):
+        with self.engine.begin() as txn:
+            txn.execute(self.table.update().where(sa.and_(*filters)).values(**data))
+            item = txn.execute(self.table.select().where(sa.and_(*filters))).fetchone()
+            if item is None:
+                raise exc.Forbidden("You are not allowed to update this object")
+        return item
+
+    def _insert_many_returning(self, rows: list[dict], filters: list):
+        result = []
+        with self.engine.begin() as txn:
+            for batch in bulk_batches(rows):
+                query = self.table.insert().values(batch).returning(*permission_columns(self.table, filters))
+                items = txn.execute(query).fetchall()
+                if not all(row_permitted(i) for i in items):
+                    raise exc.Forbidden("You are not allowed to create this object")
+                result += items
+        return [row_data(i) for i in result]
+
+    def _insert_many_and_fetch(self, rows: list[dict], filters: list):
+        with self.engine.begin() as txn:
+            ids = [txn.execute(self.table.insert().values(**data)).inserted_primary_key[0] for data in rows]
+            items = []
+            for query in bulk_select_statements(self.table, filters, 'id', ids):
+                items += [dict(i._mapping) for i in txn.execute(query).fetchall()]
+            return bulk_ordered(items, 'id', ids, "You are not allowed to create this object")
+
+    def _update_many_and_fetch(self, field, updates: list[tuple[typing.Any, dict]], filters: list):
+        # permission filters are checked on the locked rows before the update, 
+        # their identity parameters can't be used in executemany() statements
+        message = "You are not allowed to update this object"
+        values = [v for v, d in updates]
+        new_values = [d.get(field, v) for v, d in updates]
+        key = getattr(self.table.c, field)
+        with self.engine.begin() as txn:
+            items = []
+            for query in bulk_select_statements(self.table, filters, field, values, lock=True):
+                items += [dict(i._mapping) for i in txn.execute(query).fetchall()]
+            bulk_ordered(items, field, values, message)
+            query = self.table.update().where(key == sa.bindparam(BULK_KEY))
+            for batch in bulk_batches(bulk_update_params(updates)):
+                txn.execute(query, batch)
+            items = []
+            for query in bulk_select_statements(self.table, filters, field, new_values):
+                items += [dict(i._mapping) for i in txn.execute(query).fetchall()]
+            return bulk_ordered(items, field, new_values, message)
+
+    def _delete_many_rows(self, field, values: list, filters: list):
+        column = getattr(self.table.c, field)
+        with self.engine.begin() as txn:
+            for i in range(0, len(values), BULK_PARAMETER_LIMIT):
+                clauses = filters + [column.in_(values[i:i + BULK_PARAMETER_LIMIT])]
+                txn.execute(self.table.delete().where(sa.and_(*clauses)))
+
+    async def get_permission_clauses(self) -> list:
+        cache = await self._permission_cache()
+        if 'clauses' not in cache:
+            filters = await self.get_permission_filters()
+            params = await get_permission_parameters(self.request)
+            cache['clauses'] = permission_clauses(self.permissionFilterClauses, filters, params)
+        return cache['clauses']
 
+    @validate_types
+    async def create(self, item: pydantic.BaseModel, secure=True, modify_object_store_fields=False, modify_workflow_status=False) -> pydantic.BaseModel:
+        data = await self.transform_create_data(item, secure=secure, modify_object_store_fields=modify_object_store_fields,
+                                                modify_workflow_status=modify_workflow_status)
+        await self.before_create(data)
+        filters = []
+        if secure:
+            filters = list(await self.get_permission_clauses())
+        if self.supportsReturning:
+            item = await self.run_sync(self._insert_returning, data, filters)
+        else:
+            item = await self.run_sync(self._insert_and_fetch, data, filters)
+        item = self.model_construct(row_data(item))
+        self.invalidate_rows('id', [item.id])
         await self.after_create(item)
         return item
 
-    async def _get_by_field(self, field, value, secure: bool = True):
+    async def _fetch_row(self, field, value, secure: bool = True, fields: list[str] | None = None):
         filters = []
         if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
+            filters = list(await self.get_permission_clauses())
 
-        filters.append(getattr(self.table.c, field)==value)
-        query = self.table.select().where(sa.and_(*filters))
-        if self._txn:
-            txn = self._txn
-        else:
-            txn = self.engine
-        res: sa.engine.CursorResult = txn.execute(query)
-        item: sa.engine.Row = res.fetchone()
-            
+        columns = permission_columns(self.table, filters, self.projection(fields))
+        query = sa.select(columns).where(getattr(self.table.c, field)==value)
+        item: sa.engine.Row = await self.run_sync(self._fetchone, query)
         if item == None:
-            if secure:
-                insecure_item = await self._get_by_field(field, value, secure=False)
-                if insecure_item:
-                    raise exc.Forbidden("You are not allowed to access this object")
-            return None
-        item = self.Schema.model_validate(item._asdict())
-        return item       
+            return None, False
+        return row_data(item), row_permitted(item)
     
-    @validate_types
-    async def search(self, query: str | None, offset: int = 0, limit: int | None = None, 
-               order_by: list[tuple[str,str]] | None = None, secure: bool =True):
-        
-        db_query = self.table.select()
+    async def _search_filters(self, query: str | None, secure: bool = True) -> list:
         filters = []
         if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
+            filters = list(await self.get_permission_clauses())
         if query: 
-            filters.append(sa.text(query))
-        if filters:
-            db_query = db_query.where(sa.and_(*filters))
-        db_query = db_query.limit(limit).offset(offset)
-        if order_by:
-            orderby = []
-            for c,d in order_by:
-                column = c
-                if getattr(self.table.c, c, None) is None:
-                    raise exc.ValidationError("Invalid sort field '%s'" % c)
-                if d.lower() == 'desc':
-                    column += ' desc'
-                elif d.lower() == 'asc':
-                    column += ' asc'
-                else:
-                    raise exc.ValidationError("Invalid sort direction '%s'" % d)
-                orderby.append(sa.text(column))
-            db_query = db_query.order_by(*orderby)
+            restricted_fields = []
+            if secure:
+                field_permissions = await self.get_field_permissions()
+                restricted_fields = field_permissions[schema.FieldPermission.restricted]
+            filters.append(compile_query(query, self.table, self.Schema, restricted_fields))
+        return filters
+
+    async def _fetch_rows(self) -> list[dict]:
+        query = sa.select(self.table).order_by(self.table.c.id)
+        return [row_data(r) for r in await self.run_sync(self._fetchall, query)]
+
+    async def _fetch_many_by_field(self, field, values: list, secure: bool = True, fields: list[str] | None = None):
+        if not values:
+            return []
+        filters = []
+        if secure:
+            filters = list(await self.get_permission_clauses())
+        columns = permission_columns(self.table, filters, self.projection(fields))
+        query = sa.select(columns).where(getattr(self.table.c, field).in_(values))
+        items = await self.run_sync(self._fetchall, query)
+        for item in items:
+            if not row_permitted(item):
+                raise exc.Forbidden("You are not allowed to access this object")
+        return [self.model_construct(row_data(i)) for i in items]
+
+    async def _insert_many(self, rows: list[dict], secure: bool = True):
+        filters = []
+        if secure:
+            filters = list(await self.get_permission_clauses())
+        if self.supportsReturning:
+            items = await self.run_sync(self._insert_many_returning, rows, filters)
+        else:
+            items = await self.run_sync(self._insert_many_and_fetch, rows, filters)
+        self.invalidate_rows('id', [i['id'] for i in items])
+        return [self.model_construct(i) for i in items]
+
+    async def _update_many(self, field, updates: list[tuple[typing.Any, dict]], secure: bool = True):
+        filters = []
+        if secure:
+            filters = list(await self.get_permission_clauses())
+        items = await self.run_sync(self._update_many_and_fetch, field, updates, filters)
+        self.invalidate_rows(field, [v for v, d in updates])
+        return [self.model_construct(i) for i in items]
+
+    async def _delete_many(self, field, values: list, secure: bool = True):
+        filters = []
+        if secure:
+            filters = list(await self.get_permission_clauses())
+        await self.run_sync(self._delete_many_rows, field, values, filters)
+        self.invalidate_rows(field, values)
+
+    @validate_types
+    async def search(self, query: str | None, offset: int = 0, limit: int | None = None, 
+               order_by: list[tuple[str,str]] | None = None, secure: bool =True, cursor: str | None = None,
+               fields: list[str] | None = None):
+        result = await self.search_reference(query, offset=offset, limit=limit, order_by=order_by, secure=secure, 
+                                             cursor=cursor, fields=fields)
+        if result is not None:
+            return result[0]
+        filters = await self._search_filters(query, secure)
+        cursor_values = self.cursor_values(cursor, order_by) if cursor else None
+        db_query = search_statement(self.table, filters, offset=offset, limit=limit, order_by=order_by, 
+                                    cursor_values=cursor_values, fields=self.projection(fields, order_by),
+                                    nulls_high=self.nullsSortHigh)
         try:
-            if self._txn:
-                txn = self._txn
-            else:
-                txn = self.engine
-            res: sa.engine.CursorResult = txn.execute(query)
-            items: list[sa.engine.Row] = res.fetchall()
- 
+            items: list[sa.engine.Row] = await self.run_sync(self._fetchall, db_query)
         except Exception as e:
             raise SearchException(str(e))
         
-        items = [self.Schema.model_validate(i._asdict()) for i in items] 
+        items = [self.model_construct(row_data(i)) for i in items] 
         return items
+
+    @validate_types
+    async def search_with_total(self, query: str | None, offset: int = 0, limit: int | None = None, 
+               order_by: list[tuple[str,str]] | None = None, secure: bool =True, cursor: str | None = None,
+               fields: list[str] | None = None):
+        result = await self.search_reference(query, offset=offset, limit=limit, order_by=order_by, secure=secure, 
+                                             cursor=cursor, fields=fields)
+        if result is not None:
+            return result
+        # the window total would only count rows after the cursor
+        if cursor or not self.supportsWindowFunctions:
+            return await super().search_with_total(query, offset=offset, limit=limit, order_by=order_by, 
+                                                   secure=secure, cursor=cursor, fields=fields)
+        filters = await self._search_filters(query, secure)
+        db_query = search_statement(self.table, filters, offset=offset, limit=limit, order_by=order_by, with_total=True,
+                                    fields=self.projection(fields, order_by))
+        try:
+            items: list[sa.engine.Row] = await self.run_sync(self._fetchall, db_query)
+        except Exception as e:
+            raise SearchException(str(e))
+        if items:
+            total = row_total(items[0])
+        elif offset:
+            # page is past the end of the result set, no row to carry the total
+            total = await self.count(query, secure=secure)
+        else:
+            total = 0
+        items = [self.model_construct(row_data(i)) for i in items] 
+        return items, total
     
+    async def iterate(self, query: str | None, order_by: list[tuple[str,str]] | None = None, secure: bool = True,
+                      fields: list[str] | None = None, batch_size: int = 1000):
+        # server side cursor, rows are fetched from the open result in batches
+        filters = await self._search_filters(query, secure)
+        db_query = search_statement(self.table, filters, order_by=order_by, fields=self.projection(fields, order_by))
+        try:
+            conn, result = await self.run_sync(self._stream, db_query)
+        except Exception as e:
+            raise SearchException(str(e))
+        try:
+            while True:
+                rows = await self.run_sync(result.fetchmany, batch_size)
+                if not rows:
+                    break
+                yield [self.model_construct(row_data(r)) for r in rows]
+        finally:
+            await self.run_sync(conn.close)
+
     @validate_types
     async def count(self, query: str | None, secure=True) -> int:
-        db_query = sa.select([sa.func.count()]).select_from(self.table)
-        filters  = []
-        if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
-
-        if query: 
-            filters.append(sa.text(query))
-        if filters:
-            db_query = db_query.where(sa.and_(*filters))
+        result = await self.search_reference(query, limit=0, secure=secure)
+        if result is not None:
+            return result[1]
+        filters = await self._search_filters(query, secure)
+        db_query = count_statement(self.table, filters)
         try:
-            if self._txn:
-                txn = self._txn
-            else:
-                txn = self.engine
-            res: sa.engine.CursorResult = txn.execute(db_query)
-            result: sa.engine.Row = res.fetchone()
- 
+            result: sa.engine.Row = await self.run_sync(self._fetchone, db_query)
         except Exception as e:
             raise SearchException(str(e))
         return result[0]
 
+    @validate_types
+    async def estimate_count(self, query: str | None, secure=True) -> int:
+        if not self.supportsCountEstimate or self.referenceTable is not None:
+            return await self.count(query, secure=secure)
+        filters = await self._search_filters(query, secure)
+        db_query = estimate_statement(self.table, filters)
+        try:
+            result: sa.engine.Row = await self.run_sync(self._fetchone, db_query)
+        except Exception as e:
+            raise SearchException(str(e))
+        return estimate_result(result)
+
     async def _update_by_field(self, field, value, item: dict, secure: bool=True, modify_object_store_fields: bool = False, 
                                modify_workflow_status: bool = False):
         data = await self.transform_update_data(item, secure=secure,
@@ -146,17 +548,14 @@ class SQLACollection(BaseCollection):
         await self.before_update(data)
         filters = []
         if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
-        filters.append(getattr(self.table.c, field)==value)
-        with self.engine.begin() as txn:
-            self._txn = txn
-            query = self.table.update().where(sa.and_(*filters)).values(**data)
-            res: sa.engine.CursorResult = txn.execute(query)
-            item = await self._get_by_field(field, value, secure)
-            self._txn = None
-            if item is None:
-                raise exc.Forbidden("You are not allowed to update this object")
+            filters = list(await self.get_permission_clauses())
+        key = getattr(self.table.c, field)==value
+        if self.supportsReturning:
+            item = await self.run_sync(self._update_returning, data, filters, key)
+        else:
+            item = await self.run_sync(self._update_and_fetch, data, filters + [key])
+        item = self.model_construct(row_data(item))
+        self.invalidate_rows(field, [value])
         await self.after_update(item)
         return item
     
@@ -168,15 +567,11 @@ class SQLACollection(BaseCollection):
         await self.before_delete(item)
         filters = []
         if secure:
-            filters = await self.get_permission_filters()
-            filters = [sa.text(f) for f in filters]
+            filters = list(await self.get_permission_clauses())
         filters.append(getattr(self.table.c, field)==value)
         query = self.table.delete().where(sa.and_(*filters))
-        if self._txn:
-            txn = self._txn
-        else:
-            txn = self.engine
-        txn.execute(query)
+        await self.run_sync(self._execute, query)
+        self.invalidate_rows(field, [value])
         await self.after_delete(data)
         return True       
     
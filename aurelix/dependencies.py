@@ -96,6 +96,14 @@ async def get_token(request: fastapi.Request) -> schema.OIDCAccessToken:
     return token
 
 async def get_permission_identities(request: fastapi.Request) -> list[str]:
+    identities = getattr(request.state, 'permission_identities', None)
+    if identities is not None:
+        return identities
+    identities = await _get_permission_identities(request)
+    request.state.permission_identities = identities
+    return identities
+
+async def _get_permission_identities(request: fastapi.Request) -> list[str]:
     token = await get_token(request)
     if token is None:
         return []
@@ -107,3 +115,14 @@ async def get_permission_identities(request: fastapi.Request) -> list[str]:
         for g in token.roles:
             res.append('role:%s' % g)
     return res
+
+async def get_permission_parameters(request: fastapi.Request) -> dict[str, typing.Any]:
+    token = await get_token(request)
+    if token is None:
+        return {'sub': None, 'email': None, 'username': None, 'roles': []}
+    return {
+        'sub': token.sub,
+        'email': token.email if token.email_verified else None,
+        'username': token.preferred_username,
+        'roles': token.roles or []
+    }
@@ -26,6 +26,9 @@ class Forbidden(AurelixException):
 class NotFound(AurelixException):
     status_code = 404
 
+class NotAcceptable(AurelixException):
+    status_code = 406
+
 class CollectionNotFoundException(AurelixException):
     status_code = 404
 
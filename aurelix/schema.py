@@ -22,6 +22,9 @@ class CodeRefSpec(pydantic.BaseModel):
     function: str | None = pydantic.Field(None, description='Path to handler function in format app.module:function')
     code: str | None = pydantic.Field(None, description='Python code of handler function')
     function_name: str = pydantic.Field('function', description='Name of function to be loaded from code spec')
+    batch: bool = pydantic.Field(False, description='Function takes lists for the arguments after the collection and '
+                                 'is called once per batch of items, eg: function(collection, values, rows) for field '
+                                 'validators and transformers, transformers return the list of transformed values')
 
 class FieldTypeSpec(pydantic.BaseModel):
     type: str
@@ -48,6 +51,8 @@ class FieldSpec(pydantic.BaseModel):
                                                                  validation_alias=pydantic.AliasChoices('input_transformers', 'inputTransformers'))
     outputTransformers: list[CodeRefSpec] | None = pydantic.Field(None,
                                                                  validation_alias=pydantic.AliasChoices('output_transformers', 'outputTransformers'))
+    deferred: bool = pydantic.Field(False, description='Leave this field out of listings and relationship data unless '
+                                    'requested through the fields parameter. Only for text, json and encrypted-string fields')
 
 
 
@@ -70,9 +75,30 @@ class ExtensionViewSpec(pydantic.BaseModel):
     openapi_extra: dict[str, typing.Any] | None = None
     handler: CodeRefSpec = pydantic.Field(description='Function spec to handle this view')
 
+class CountMode(enum.StrEnum):
+    exact: str = 'exact'
+    estimate: str = 'estimate'
+    none: str = 'none'
+
+class ExportFormat(enum.StrEnum):
+    ndjson: str = 'ndjson'
+    csv: str = 'csv'
+    arrow: str = 'arrow'
+    parquet: str = 'parquet'
+
+class ListingCacheSpec(pydantic.BaseModel):
+    maxSize: int = pydantic.Field(1000, description='Maximum number of listing responses kept in the cache, least recently used responses are evicted first',
+                                  validation_alias=pydantic.AliasChoices('max_size', 'maxSize'))
+    ttl: float | None = pydantic.Field(10, description='Seconds a cached response is served, null to keep it until the model or a related model is written')
+
 class ListingViewSpec(ViewSpec):
     maxPageSize: int = pydantic.Field(100, description='Maximum number of items in listing pages',
                                     validation_alias=pydantic.AliasChoices('max_page_size', 'maxPageSize'))
+    countMode: CountMode = pydantic.Field(str(CountMode.exact), 
+                                    description="How total records of listing pages are computed. 'exact' counts the filtered records, " 
+                                    "'estimate' uses the database planner estimate where available and 'none' skips the total",
+                                    validation_alias=pydantic.AliasChoices('count_mode', 'countMode'))
+    cache: ListingCacheSpec | None = pydantic.Field(None, description='Cache listing responses by their parameters and the permissions of the caller')
 
 class ModelViewsSpec(pydantic.BaseModel):
 
@@ -110,7 +136,8 @@ class FieldPermission(enum.StrEnum):
 
 class PermissionFilterSpec(pydantic.BaseModel):
     identities: list[str] = pydantic.Field(description='List of identities to match against')
-    whereFilter: str | None = pydantic.Field(None, description="'where' statement to add to CRUD uperations if identity matches",
+    whereFilter: str | None = pydantic.Field(None, description="'where' statement to add to CRUD uperations if identity matches. "
+                                            "Identity values are available as :sub, :email, :username and :roles bound parameters",
                                             validation_alias=pydantic.AliasChoices('where_filter', 'whereFilter'))
     defaultFieldPermission: FieldPermission = pydantic.Field(str(FieldPermission.readWrite), 
                                                 description='Default permission for fields',
@@ -163,6 +190,11 @@ class FieldObjectStoreSpec(pydantic.BaseModel):
     objectStore: str = pydantic.Field(validation_alias=pydantic.AliasChoices('object_store', 'objectStore'))
     bucket: str
 
+class CacheSpec(pydantic.BaseModel):
+    maxSize: int = pydantic.Field(1000, description='Maximum number of rows kept in the cache, least recently used rows are evicted first',
+                                  validation_alias=pydantic.AliasChoices('max_size', 'maxSize'))
+    ttl: float | None = pydantic.Field(60, description='Seconds a cached row is served before it is read again, null to keep it until it is written')
+
 class ModelSpec(pydantic.BaseModel):
 
     spec_version: str = 'model/0.1'
@@ -200,6 +232,10 @@ class ModelSpec(pydantic.BaseModel):
     permissionFilters: list[PermissionFilterSpec] | None = pydantic.Field(None, description='Permission rules for rows and field security',
         validation_alias=pydantic.AliasChoices('permission_filters', 'permissionFilters'))
     validators: list[CodeRefSpec] | None = pydantic.Field(None, description='Event hook, for validating model before insert/update into database')
+    cache: CacheSpec | None = pydantic.Field(None, description='In-process cache of rows read by identifier, invalidated when the rows are written')
+    referenceData: bool = pydantic.Field(False, description='Hold the whole table in memory to serve reads, relationships and simple listing '
+                                         'queries without database queries, for small lookup models. Reloaded after writes',
+        validation_alias=pydantic.AliasChoices('reference_data', 'referenceData'))
 
 
 class DatabaseType(enum.StrEnum):
@@ -213,6 +249,8 @@ class DatabaseSpec(pydantic.BaseModel):
     auto_initialize: bool = False
     url: str | None = None
     url_env: str | None = None
+    thread_pool_size: int | None = pydantic.Field(None, 
+        description='Number of worker threads for running blocking queries of sqlalchemy-sync models on this database')
 
     @pydantic.model_validator(mode='before')
     @classmethod
@@ -223,6 +261,22 @@ class DatabaseSpec(pydantic.BaseModel):
             raise ValueError("Either url or url_env is required")
         return data
 
+class InvalidationBackend(enum.StrEnum):
+
+    local: str = 'local'
+    unix: str = 'unix'
+    redis: str = 'redis'
+
+class InvalidationSpec(pydantic.BaseModel):
+
+    backend: InvalidationBackend = pydantic.Field(str(InvalidationBackend.unix),
+        description='local (single worker), unix (workers on this host) or redis (workers on several hosts)')
+    path: str | None = pydantic.Field(None,
+        description='Directory shared by the worker sockets of the unix backend, defaults to aurelix-invalidation in the temporary directory')
+    url: str | None = pydantic.Field(None, description='Redis url of the redis backend')
+    url_env: str | None = None
+    channel: str = pydantic.Field('aurelix-invalidation', description='Redis channel of the redis backend')
+
 class InitOAuthSpec(pydantic.BaseModel):
     client_id: str 
     client_secret: str
@@ -237,6 +291,10 @@ class AppSpec(pydantic.BaseModel):
     spec_version: str = 'app/0.1'
     model_config = pydantic.ConfigDict(protected_namespaces=())
     debug: bool = False
+    production_mode: bool = pydantic.Field(False, description='Skip argument validation on internal collection method calls. '
+                                           'Request data is still validated by the views')
+    fast_serialization: bool = pydantic.Field(False, description='Encode model view responses directly with orjson '
+                                              'instead of validating them against the response model first')
     # following config are just delegating to fastapi.FastAPI constructor
     title: str = "Aurelix Application"
     summary: str|None = None
@@ -257,6 +315,8 @@ class AppSpec(pydantic.BaseModel):
         description='list of object stores', validation_alias=pydantic.AliasChoices('object_stores', 'objectStores'))
     oidc_discovery_endpoint: str | None = pydantic.Field(None, description='OIDC discovery endpoint for authentication')
     views: AppViewsSpec = pydantic.Field(default_factory=AppViewsSpec, description='List of views to register on this app')
+    invalidation: InvalidationSpec | None = pydantic.Field(None,
+        description='Channel telling the other worker processes to drop their cached rows after a write')
 
 class SearchResultLinks(pydantic.BaseModel):
     next: str | None = None
@@ -278,6 +338,17 @@ class ModelResultLinks(pydantic.BaseModel):
 class DeleteConfirmation(pydantic.BaseModel):
     delete: bool = False
 
+class BulkDeleteConfirmation(DeleteConfirmation):
+    identifiers: list[str | int]
+
+class BatchGetRequest(pydantic.BaseModel):
+    ids: list[str | int]
+    fields: list[str] | None = None
+
+class BulkUpdateItem(pydantic.BaseModel):
+    identifier: str | int
+    data: dict[str, typing.Any | None]
+
 class SimpleMessage(pydantic.BaseModel):
     detail: str | dict | None = None
 
@@ -4,11 +4,13 @@ import typing
 import databases
 import sqlalchemy as sa
 import jwt
+import concurrent.futures
 
 class DatabaseState(typing.TypedDict):
     engine: sa.engine.Engine
     metadata: sa.MetaData
     db: databases.Database
+    executor: concurrent.futures.ThreadPoolExecutor
 
 class AppState(typing.TypedDict):
     databases: dict[str, DatabaseState]
@@ -20,6 +22,7 @@ class AppState(typing.TypedDict):
     views: typing.Any # aurelix.crud.base.ExtensibleViewsApp
     oidc_jwk_client: jwt.PyJWKClient
     object_stores: dict[str, typing.Any] # aurelix.crud.base.BaseObjectStore
+    invalidation_bus: typing.Any # aurelix.crud.invalidation.InvalidationBus
 
 APP_STATE: dict[fastapi.FastAPI, AppState] = {}
 
@@ -3,11 +3,30 @@ import enum
 import fastapi
 import typing
 import functools
+import json
+import base64
+import binascii
+import hashlib
+import orjson
+from fastapi.encoders import jsonable_encoder
 from . import schema
+from . import exc
+from .dependencies import get_permission_identities
 
 def validate_types(func):
     return pydantic.validate_call(config={'arbitrary_types_allowed': True})(func)
 
+def unvalidated_methods(cls) -> dict[str, typing.Callable]:
+    result = {}
+    for klass in reversed(cls.__mro__):
+        for name, value in vars(klass).items():
+            raw = getattr(value, 'raw_function', None)
+            if raw is not None:
+                result[name] = raw
+            else:
+                result.pop(name, None)
+    return result
+
 def snake_to_pascal(snake):
     return ''.join([k.capitalize() for k in snake.split('_')])
 
@@ -17,31 +36,128 @@ def snake_to_human(snake):
 def snake_to_camel(snake):
     return ''.join([k if i == 0 else k.capitalize() for i,k in enumerate(snake.split('_'))])
 
-async def item_json(col, item: pydantic.BaseModel):
-    from .crud.dependencies import get_collection
+def dump_json(obj) -> bytes:
+    return orjson.dumps(obj, default=jsonable_encoder, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+def _cursor_default(obj):
+    if hasattr(obj, 'isoformat'):
+        return obj.isoformat()
+    return str(obj)
+
+def encode_cursor(order_by: list[tuple[str, str]], item: pydantic.BaseModel) -> str:
+    payload = {
+        'order_by': [[c, d.lower()] for c, d in order_by],
+        'values': [getattr(item, c) for c, d in order_by]
+    }
+    data = json.dumps(payload, default=_cursor_default).encode('utf8')
+    return base64.urlsafe_b64encode(data).decode('utf8').rstrip('=')
+
+def decode_cursor(cursor: str) -> tuple[list[tuple[str, str]], list]:
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(data)
+        order_by = [(c, d) for c, d in payload['order_by']]
+        values = payload['values']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise exc.ValidationError("Invalid cursor")
+    if len(order_by) != len(values):
+        raise exc.ValidationError("Invalid cursor")
+    return order_by, values
+
+class RelationLoader(object):
+    """Request scoped loader that resolves relationship objects in batches"""
+
+    def __init__(self, request: fastapi.Request):
+        self.request = request
+        self.collections = {}
+        self.objects: dict[tuple[str, str], dict[typing.Any, pydantic.BaseModel | None]] = {}
+        self.results: dict[tuple[str, str, typing.Any], dict | None] = {}
+
+    async def get_collection(self, name):
+        from .crud.dependencies import get_collection
+        if name not in self.collections:
+            self.collections[name] = await get_collection(self.request, name)
+        return self.collections[name]
+
+    def relation_fields(self, field_col, field: schema.FieldSpec) -> list[str] | None:
+        # relationship data leaves out deferred fields like listings do
+        fields = field_col.listing_fields()
+        if fields is not None and field.relation.field not in fields:
+            fields = fields + [field.relation.field]
+        return fields
+
+    async def prefetch(self, col, items: list[pydantic.BaseModel], fields: list[str] | None = None):
+        spec: schema.ModelSpec = col.spec
+        for field_name, field in spec.fields.items():
+            if not field.relation or (fields is not None and field_name not in fields):
+                continue
+            loaded = self.objects.setdefault((field.relation.model, field.relation.field), {})
+            values = set(getattr(i, field_name) for i in items)
+            values = [v for v in values if v is not None and v not in loaded]
+            if not values:
+                continue
+            field_col = await self.get_collection(field.relation.model)
+            objs = await field_col._get_many_by_field(field.relation.field, values, 
+                                                      fields=self.relation_fields(field_col, field))
+            for obj in objs:
+                loaded[getattr(obj, field.relation.field)] = obj
+            for v in values:
+                loaded.setdefault(v, None)
+
+    async def relationship(self, field: schema.FieldSpec, value) -> dict | None:
+        key = (field.relation.model, field.relation.field, value)
+        if key in self.results:
+            return self.results[key]
+        field_col = await self.get_collection(field.relation.model)
+        loaded = self.objects.setdefault((field.relation.model, field.relation.field), {})
+        if value not in loaded:
+            objs = await field_col._get_many_by_field(field.relation.field, [value], 
+                                                      fields=self.relation_fields(field_col, field))
+            loaded[value] = objs[0] if objs else None
+        field_obj = loaded[value]
+        result = None
+        if field_obj is not None:
+            result = {
+                'data': await field_col.transform_output_data(field_obj),
+                'links': {
+                    'self': field_col.url(field_obj),
+                    'collection': field_col.url()
+                },
+                'meta': {
+                    'collection': field.relation.model,
+                    'identifier': str(field_col.get_identifier(field_obj))
+                }
+            }
+        self.results[key] = result
+        return result
+
+def get_relation_loader(request: fastapi.Request) -> RelationLoader:
+    loader = getattr(request.state, 'relation_loader', None)
+    if loader is None:
+        loader = RelationLoader(request)
+        request.state.relation_loader = loader
+    return loader
+
+async def item_json(col, item: pydantic.BaseModel, fields: list[str] | None = None, attributes: dict | None = None):
     spec: schema.ModelSpec = col.spec
     request: fastapi.Request = col.request
+    loader = get_relation_loader(request)
     rels = {}
     for field_name, field in spec.fields.items():
+        if fields is not None and field_name not in fields:
+            continue
         field_value = getattr(item, field_name)
         if field_value is None:
             continue
         if field.relation:
-            rels.setdefault(field_name, {})
-            field_col = await get_collection(request, field.relation.model)
-            field_obj = await field_col.get(field_value)
-            rels[field_name].setdefault('links', {})
-            rels[field_name].setdefault('meta', {})
-            rels[field_name]['data'] = await field_col.transform_output_data(field_obj)
-            rels[field_name]['links']['self'] = field_col.url(field_obj)
-            rels[field_name]['links']['collection'] = field_col.url()
-            rels[field_name]['meta']['collection'] = field.relation.model
-            rels[field_name]['meta']['identifier'] = str(field_col.get_identifier(field_obj))
+            rel = await loader.relationship(field, field_value)
+            if rel is not None:
+                rels[field_name] = rel
 
     result = {
         'type': col.name, 
         'id': item.id,
-        'attributes': await col.transform_output_data(item),
+        'attributes': attributes if attributes is not None else await col.transform_output_data(item, fields=fields),
         'links': {
             'self': col.url(item),
             'collection': col.url()
@@ -50,6 +166,38 @@ async def item_json(col, item: pydantic.BaseModel):
         result['relationships'] = rels
     return result
 
+async def items_json(col, items: list[pydantic.BaseModel], fields: list[str] | None = None) -> list[dict]:
+    await get_relation_loader(col.request).prefetch(col, items, fields=fields)
+    attributes = await col.transform_output_items(items, fields=fields)
+    return [await item_json(col, i, fields=fields, attributes=a) for i, a in zip(items, attributes)]
+
+async def items_etag(col, items: list[pydantic.BaseModel], fields: list[str] | None = None, *extra) -> str:
+    # weak validator of the json representation of items, from the id and 
+    # modification time of the items and of the related objects shown with 
+    # them, the caller's permissions and whatever else the response depends on
+    loader = get_relation_loader(col.request)
+    await loader.prefetch(col, items, fields=fields)
+    identities = await get_permission_identities(col.request)
+    parts = [col.name, sorted(identities), await col.permission_key(), fields, extra]
+    relations = [(k, f) for k, f in col.spec.fields.items() 
+                 if f.relation and (fields is None or k in fields)]
+    for item in items:
+        parts.append((item.id, item.dateModified))
+        for field_name, field in relations:
+            loaded = loader.objects[(field.relation.model, field.relation.field)]
+            obj = loaded.get(getattr(item, field_name), None)
+            if obj is not None:
+                parts.append((field.relation.model, obj.id, obj.dateModified))
+    return 'W/"%s"' % hashlib.sha1(repr(parts).encode('utf8')).hexdigest()
+
+def etag_matches(request: fastapi.Request, etag: str) -> bool:
+    # If-None-Match uses weak comparison
+    header = request.headers.get('if-none-match', None)
+    if not header:
+        return False
+    tags = [t.strip().removeprefix('W/') for t in header.split(',')]
+    return '*' in tags or etag.removeprefix('W/') in tags
+
 P = typing.ParamSpec('P')
 T = typing.TypeVar('T')
 
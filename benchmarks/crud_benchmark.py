@@ -0,0 +1,95 @@
+"""Per-request timing of the CRUD endpoints with and without an app option
+(``production_mode`` or ``fast_serialization``).
+
+Usage::
+
+    python benchmarks/crud_benchmark.py --requests 500 --storage sqlalchemy-sync
+    python benchmarks/crud_benchmark.py --option fast_serialization --page-size 100
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import yaml
+from fastapi.testclient import TestClient
+from aurelix.api import load_app
+
+MODEL = {
+    'name': 'bench',
+    'storage_type': {'name': 'sqlalchemy', 'database': 'default'},
+    'fields': {
+        'title': {'title': 'Title', 'data_type': {'type': 'string', 'size': 128}, 'required': True},
+        'body': {'title': 'Body', 'data_type': {'type': 'text'}},
+        'count': {'title': 'Count', 'data_type': {'type': 'integer'}},
+    }
+}
+
+def write_app(directory: str, storage: str, option: str, enabled: bool) -> str:
+    os.makedirs(os.path.join(directory, 'models'))
+    app = {
+        'title': 'Benchmark',
+        option: enabled,
+        'databases': [{
+            'name': 'default',
+            'auto_initialize': True,
+            'url': 'sqlite:///%s' % os.path.join(directory, 'bench.db')
+        }]
+    }
+    model = dict(MODEL, storage_type={'name': storage, 'database': 'default'})
+    with open(os.path.join(directory, 'app.yaml'), 'w') as f:
+        yaml.safe_dump(app, f)
+    with open(os.path.join(directory, 'models', 'bench.yaml'), 'w') as f:
+        yaml.safe_dump(model, f)
+    return os.path.join(directory, 'app.yaml')
+
+def timed(func, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        func(i)
+    return (time.perf_counter() - start) / n * 1000
+
+def run(storage: str, option: str, enabled: bool, n: int, page_size: int) -> dict[str, float]:
+    with tempfile.TemporaryDirectory() as d:
+        app = asyncio.run(load_app(write_app(d, storage, option, enabled)))
+        with TestClient(app) as client:
+            def create(i):
+                r = client.post('/bench/', json={'title': 'item %s' % i, 'body': 'x' * 200, 'count': i})
+                assert r.status_code == 200, r.text
+
+            def read(i):
+                r = client.get('/bench/%s' % (i + 1))
+                assert r.status_code == 200, r.text
+
+            def update(i):
+                r = client.patch('/bench/%s' % (i + 1), json={'count': i * 2})
+                assert r.status_code == 200, r.text
+
+            def listing(i):
+                r = client.get('/bench/', params={'page_size': page_size, 'page': i % max(1, n // page_size)})
+                assert r.status_code == 200, r.text
+
+            return {
+                'create': timed(create, n),
+                'read': timed(read, n),
+                'update': timed(update, n),
+                'listing': timed(listing, n),
+            }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--requests', type=int, default=300)
+    parser.add_argument('-s', '--storage', default='sqlalchemy-sync', choices=['sqlalchemy-sync', 'sqlalchemy'])
+    parser.add_argument('-o', '--option', default='production_mode', choices=['production_mode', 'fast_serialization'])
+    parser.add_argument('-p', '--page-size', type=int, default=20)
+    args = parser.parse_args()
+
+    disabled = run(args.storage, args.option, False, args.requests, args.page_size)
+    enabled = run(args.storage, args.option, True, args.requests, args.page_size)
+    print('%-10s %14s %14s %10s' % ('endpoint', 'off (ms)', 'on (ms)', 'saving'))
+    for k in disabled.keys():
+        saving = (disabled[k] - enabled[k]) / disabled[k] * 100
+        print('%-10s %14.3f %14.3f %9.1f%%' % (k, disabled[k], enabled[k], saving))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Row to model decoding of a listing page, validated against trusted construction.
+
+Usage::
+
+    python benchmarks/decode_benchmark.py --rows 1000 --repeat 20
+"""
+import argparse
+import datetime
+import time
+import pydantic
+import sqlalchemy as sa
+import sqlalchemy_utils as sautils
+from aurelix import schema
+from aurelix.crud.lowcode import generate_pydantic_model, generate_field_decoders
+from aurelix.crud.sqla import row_data
+from aurelix.crud.base import BaseCollection
+
+MODEL = {
+    'name': 'bench',
+    'storage_type': {'name': 'sqlalchemy-sync', 'database': 'default'},
+    'fields': {
+        'title': {'title': 'Title', 'data_type': {'type': 'string', 'size': 128}, 'required': True},
+        'body': {'title': 'Body', 'data_type': {'type': 'text'}},
+        'count': {'title': 'Count', 'data_type': {'type': 'integer'}},
+        'ratio': {'title': 'Ratio', 'data_type': {'type': 'float'}},
+        'active': {'title': 'Active', 'data_type': {'type': 'boolean'}},
+        'status': {'title': 'Status', 'data_type': {'type': 'string', 'size': 16, 'enum': [
+            {'value': 'new', 'label': 'New'}, {'value': 'done', 'label': 'Done'}]}},
+        'meta': {'title': 'Meta', 'data_type': {'type': 'json'}},
+    }
+}
+
+def create_rows(n: int) -> list[dict]:
+    metadata = sa.MetaData()
+    table = sa.Table('bench', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('dateCreated', sa.DateTime),
+        sa.Column('dateModified', sa.DateTime),
+        sa.Column('creator', sa.String(256)),
+        sa.Column('editor', sa.String(256)),
+        sa.Column('title', sa.String(128)),
+        sa.Column('body', sa.Text),
+        sa.Column('count', sa.Integer),
+        sa.Column('ratio', sa.Float),
+        sa.Column('active', sa.Boolean),
+        sa.Column('status', sa.String(16)),
+        sa.Column('meta', sautils.types.JSONType))
+    engine = sa.create_engine('sqlite://')
+    metadata.create_all(engine)
+    now = datetime.datetime.now()
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{
+            'dateCreated': now, 'dateModified': now, 'creator': 'bench', 'editor': 'bench',
+            'title': 'item %s' % i, 'body': 'x' * 200, 'count': i, 'ratio': i / 3,
+            'active': bool(i % 2), 'status': 'done' if i % 2 else 'new', 'meta': {'index': i}
+        } for i in range(n)])
+        return [row_data(r) for r in conn.execute(sa.select(table)).fetchall()]
+
+def timed(func, rows: list[dict], repeat: int) -> float:
+    start = time.perf_counter()
+    for i in range(repeat):
+        # decoders may convert values in place
+        func([dict(r) for r in rows])
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-r', '--rows', type=int, default=1000)
+    parser.add_argument('-n', '--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    spec = schema.ModelSpec.model_validate(MODEL)
+    Schema = generate_pydantic_model(spec, name='Bench')
+    decoders = generate_field_decoders(spec, Schema)
+    adapter = pydantic.TypeAdapter(list[Schema])
+    rows = create_rows(args.rows)
+
+    # model_construct() only needs the class attributes, not a request
+    Collection = type('BenchCollection', (BaseCollection,), {'Schema': Schema, 'fieldDecoders': decoders})
+    collection = object.__new__(Collection)
+
+    paths = {
+        'model_validate': lambda rows: [Schema.model_validate(r) for r in rows],
+        'type_adapter': lambda rows: adapter.validate_python(rows),
+        'pydantic_construct': lambda rows: [Schema.model_construct(**r) for r in rows],
+        'trusted': lambda rows: [collection.model_construct(r) for r in rows],
+    }
+    assert ([i.model_dump() for i in paths['trusted']([dict(r) for r in rows])] ==
+            [i.model_dump() for i in paths['model_validate'](rows)])
+
+    results = dict((k, timed(f, rows, args.repeat)) for k, f in paths.items())
+    baseline = results['model_validate']
+    print('%-20s %12s %10s' % ('path', 'page (ms)', 'speedup'))
+    for k, v in results.items():
+        print('%-20s %12.3f %9.2fx' % (k, v, baseline / v))
+
+if __name__ == '__main__':
+    main()
@@ -32,6 +32,10 @@ CLIENT_REQUIRES=[
     'requests',
 ]
 
+ARROW_REQUIRES=[
+    'pyarrow',
+]
+
 TEST_REQUIRES=[
     'pytest',
     'pytest-server-fixtures[s3]'
@@ -58,8 +62,9 @@ setup(name='aurelix',
       install_requires=CLIENT_REQUIRES,
       extras_require={
             'server': SERVER_REQUIRES,
+            'arrow': ARROW_REQUIRES,
             'test': CLIENT_REQUIRES + SERVER_REQUIRES + PG_REQUIRES + TEST_REQUIRES,
-            'all': CLIENT_REQUIRES + SERVER_REQUIRES + PG_REQUIRES + TEST_REQUIRES
+            'all': CLIENT_REQUIRES + SERVER_REQUIRES + PG_REQUIRES + TEST_REQUIRES + ARROW_REQUIRES
       },
       entry_points={
           'console_scripts': [
@@ -52,4 +52,38 @@ def aurelix(request, s3_server: s3.MinioServer):
     request.addfinalizer(server.teardown)
 
     from aurelix.client import Client
-    return Client(server.uri)
\ No newline at end of file
+    return Client(server.uri)
+def _app_client(url: str, config: str = 'app.yaml'):
+    # in-process app without object storage server, for views that do not
+    # upload or download files
+    os.environ['DB_URL'] = url
+    os.environ.setdefault('S3_ENDPOINT', 'http://127.0.0.1:9000')
+    os.environ.setdefault('S3_ACCESS_KEY', 'accesskey')
+    os.environ.setdefault('S3_SECRET_KEY', 'secretkey')
+
+    from aurelix.api import load_app
+    from aurelix import state
+
+    app = asyncio.run(load_app(str(moddir / 'simple_app' / config)))
+    # start from empty tables
+    dbconf = state.APP_STATE[app]['databases']['default']
+    dbconf['metadata'].drop_all(dbconf['engine'])
+    dbconf['metadata'].create_all(dbconf['engine'])
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope='session')
+def app_client():
+    yield from _app_client('sqlite:////tmp/test_app.db')
+
+@pytest.fixture(scope='session')
+def production_app_client():
+    # same models with production_mode and fast_serialization
+    yield from _app_client('sqlite:////tmp/test_app_production.db', 'app_production.yaml')
+
+@pytest.fixture(scope='session')
+def pg_app_client():
+    url = os.environ.get('AURELIX_TEST_POSTGRES_URL', None)
+    if not url:
+        pytest.skip('AURELIX_TEST_POSTGRES_URL is not set')
+    yield from _app_client(url)
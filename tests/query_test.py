@@ -0,0 +1,92 @@
+from aurelix.crud.query import compile_query, match_query, field_adapter
+from aurelix.crud.sqla import estimate_statement
+from sqlalchemy.dialects import postgresql
+from aurelix import exc
+import sqlalchemy as sa
+import pydantic
+import datetime
+import enum
+import pytest
+
+table = sa.Table('mymodel', sa.MetaData(), 
+    sa.Column('id', sa.Integer, primary_key=True),
+    sa.Column('title', sa.String(128)),
+    sa.Column('dateCreated', sa.DateTime))
+
+class Kind(enum.StrEnum):
+    a = 'a'
+    b = 'b'
+
+class MyModel(pydantic.BaseModel):
+    id: int | None = None
+    title: str | None = None
+    kind: Kind | None = None
+    dateCreated: datetime.datetime | None = None
+
+def _compile(query, restricted_fields=None):
+    return compile_query(query, table, MyModel, restricted_fields).compile()
+
+def test_query():
+    compiled = _compile("title = 'it''s' and (id >= 3 or id in (1, 2))")
+    assert str(compiled) == 'mymodel.title = :title_1 AND (mymodel.id >= :id_1 OR mymodel.id IN (__[POSTCOMPILE_id_2]))'
+    assert compiled.params == {'title_1': "it's", 'id_1': 3, 'id_2': [1, 2]}
+
+    compiled = _compile("not title like 'a%' and dateCreated > '2023-01-01T00:00:00'")
+    assert compiled.params['dateCreated_1'] == datetime.datetime(2023, 1, 1)
+
+    assert str(_compile('title is not null')) == 'mymodel.title IS NOT NULL'
+    assert str(_compile('title = null')) == 'mymodel.title IS NULL'
+
+@pytest.mark.parametrize('query', [
+    "title = ",
+    "title == 'a'",
+    "foo = 1",
+    "id = 'abc'",
+    "1=1",
+    "title = 'a'; drop table mymodel",
+    "(title = 'a'",
+])
+def test_invalid_query(query):
+    with pytest.raises(exc.SearchException):
+        _compile(query)
+
+def test_field_adapter_reused():
+    _compile("dateCreated > '2023-01-01T00:00:00'")
+    adapter = field_adapter(MyModel, 'dateCreated')
+    _compile("dateCreated < '2024-01-01T00:00:00' and id = 1")
+    assert field_adapter(MyModel, 'dateCreated') is adapter
+
+def test_restricted_field_query():
+    with pytest.raises(exc.SearchException):
+        _compile("title = 'a'", restricted_fields=['title'])
+
+def test_match_query():
+    rows = [
+        {'id': 1, 'title': 'a', 'kind': 'a', 'dateCreated': datetime.datetime(2023, 1, 1)},
+        {'id': 2, 'title': None, 'kind': None, 'dateCreated': None},
+        {'id': 3, 'title': 'b', 'kind': 'b', 'dateCreated': datetime.datetime(2023, 6, 1)},
+    ]
+    def ids(query):
+        match = match_query(query, MyModel)
+        return [r['id'] for r in rows if match(r)]
+
+    assert ids("kind = 'a' or id in (2, 3)") == [1, 2, 3]
+    # comparisons with null are unknown, also when negated
+    assert ids("not kind = 'a'") == [3]
+    assert ids("title is null or dateCreated > '2023-02-01T00:00:00'") == [2, 3]
+    assert ids("not (id > 1 and kind in ('b'))") == [1]
+
+    # left to the database, text comparisons follow the column collation
+    assert match_query("title like 'a%'", MyModel) is None
+    assert match_query("title > 'a'", MyModel) is None
+    assert match_query("title = 'a'", MyModel) is None
+    assert match_query("id = 1 or title != 'a'", MyModel) is None
+    assert match_query("title in ('a', 'b')", MyModel) is None
+    with pytest.raises(exc.SearchException):
+        match_query("title = 'a'", MyModel, restricted_fields=['title'])
+
+def test_estimate_statement():
+    query = compile_query("dateCreated > '2023-01-01T00:00:00' and title in ('x :y', 'b')", table, MyModel)
+    compiled = estimate_statement(table, [query]).compile(dialect=postgresql.dialect())
+    assert str(compiled).startswith('EXPLAIN (FORMAT JSON) SELECT ')
+    assert compiled.params == {'dateCreated_1': datetime.datetime(2023, 1, 1), 'title_1': ['x :y', 'b']}